@@ -0,0 +1,128 @@
+"""Время вывода переключателя страниц в зависимости от длины ленты.
+
+Сравнивает прежний вывод — Paginator с COUNT(*) и ссылкой на каждую
+страницу page_range — с окном страниц CursorPaginator. Ленты разной
+длины создаются во временной базе в памяти; замеряется страница из
+середины ленты: выборка, окно и рендер переключателя.
+
+    python benchmarks/pagination.py --output benchmarks/pagination.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.paginator import Paginator  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.template import Context, Template  # noqa: E402
+from django.template.loader import get_template  # noqa: E402
+
+from posts.models import Post, User  # noqa: E402
+from posts.paginators import NEXT, CursorPaginator  # noqa: E402
+
+PER_PAGE = 10
+
+# includes/paginator.html до перехода на курсоры.
+LEGACY = Template(
+    '{% if page.has_other_pages %}<ul class="pagination">'
+    '{% if page.has_previous %}'
+    '<li><a href="?page={{ page.previous_page_number }}">&laquo;</a></li>'
+    '{% endif %}'
+    '{% for i in page.paginator.page_range %}'
+    '{% if page.number == i %}<li class="active"><span>{{ i }}</span></li>'
+    '{% else %}<li><a href="?page={{ i }}">{{ i }}</a></li>{% endif %}'
+    '{% endfor %}'
+    '{% if page.has_next %}'
+    '<li><a href="?page={{ page.next_page_number }}">&raquo;</a></li>'
+    '{% endif %}'
+    '</ul>{% endif %}'
+)
+
+
+def grow(author, size):
+    missing = size - Post.objects.count()
+    for start in range(0, missing, 5000):
+        Post.objects.bulk_create(
+            Post(text=f'post {start + i}', author=author)
+            for i in range(min(5000, missing - start)))
+
+
+def median_ms(action, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        html = action()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3), html
+
+
+def measure(repeat):
+    posts = Post.objects.order_by('-pub_date', '-id')
+    middle = posts.count() // PER_PAGE // 2 + 1
+
+    def legacy():
+        page = Paginator(posts, PER_PAGE).get_page(middle)
+        list(page)
+        return LEGACY.render(Context({'page': page}))
+
+    paginator = CursorPaginator(posts, PER_PAGE)
+    anchor = posts[(middle - 1) * PER_PAGE - 1]
+    cursor = paginator.encode_cursor(NEXT, anchor, middle)
+    template = get_template('includes/paginator.html')
+
+    def windowed():
+        page = paginator.get_page(cursor)
+        return template.render({'page': page})
+
+    legacy_ms, legacy_html = median_ms(legacy, repeat)
+    windowed_ms, windowed_html = median_ms(windowed, repeat)
+    return {
+        'page': middle,
+        'legacy_ms': legacy_ms,
+        'legacy_links': legacy_html.count('<li'),
+        'windowed_ms': windowed_ms,
+        'windowed_links': windowed_html.count('<li'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='куда записать результат в JSON')
+    args = parser.parse_args()
+
+    connection.creation.create_test_db(verbosity=0, serialize=False)
+    author = User.objects.create_user(username='pagination_bench')
+    results = {}
+    for size in sorted(args.sizes):
+        grow(author, size)
+        results[str(size)] = measure(args.repeat)
+
+    report = {
+        'python': sys.version.split()[0],
+        'database': connection.vendor,
+        'per_page': PER_PAGE,
+        'repeat': args.repeat,
+        'posts': results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Замер холодного старта: django.setup() и первый запрос через WSGI.
+
+Каждый прогон — отдельный процесс интерпретатора, как у нового воркера.
+
+    python benchmarks/startup.py --runs 10 --output benchmarks/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from yatube.wsgi import application
+statuses = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL':
+    'HTTP/1.1', 'wsgi.url_scheme': 'http', 'wsgi.input': sys.stdin.buffer,
+    'wsgi.errors': sys.stderr,
+}
+body = b''.join(application(environ, lambda s, h: statuses.append(s)))
+first_request = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (setup_done - started) * 1000,
+    'first_request_ms': (first_request - setup_done) * 1000,
+    'status': statuses[0],
+}))
+'''
+
+
+def run_once(path):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings')
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, path], cwd=BASE_DIR, env=env,
+        check=True, capture_output=True, text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def summarize(runs, field):
+    values = sorted(run[field] for run in runs)
+    return {
+        'min': round(values[0], 2),
+        'median': round(statistics.median(values), 2),
+        'max': round(values[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/about/tech/',
+                        help='URL первого запроса')
+    parser.add_argument('--output', help='куда записать результат в JSON')
+    args = parser.parse_args()
+
+    runs = [run_once(args.path) for _ in range(args.runs)]
+    report = {
+        'python': sys.version.split()[0],
+        'path': args.path,
+        'runs': args.runs,
+        'statuses': sorted({run['status'] for run in runs}),
+    }
+    for field in ('setup_ms', 'first_request_ms', 'process_ms'):
+        report[field] = summarize(runs, field)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    # Фоновые потоки миниатюр обращаются к базе вне теста; тесты Django
+    # в posts/tests отключают их через override_settings.
+    settings.THUMBNAIL_WORKERS = 0
@@ -0,0 +1,318 @@
+"""Версионированное JSON API: те же ленты, посты, профили и группы, что
+и в posts/urls.py, и пакетная запись постов и комментариев.
+
+Строки читаются через values() с JOIN автора и группы и переводятся в
+словари по заранее собранному плану — модели не создаются. Параметр
+fields выбирает поля через запятую (author — все поля автора,
+author.username — одно), limit — размер страницы, cursor — страницу.
+"""
+import base64
+import binascii
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import (condition, require_POST,
+                                          require_safe)
+
+from . import bulk
+from .counters import estimated_post_count
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .timeline import TimelinePaginator
+from .views import (_author_etag, _feed_etag, _feed_last_modified,
+                    anonymous_fast_path)
+
+
+def _media_url(name):
+    return settings.MEDIA_URL + name if name else None
+
+
+# Публичное имя поля: (путь для values(), преобразование или None).
+# Имя с точкой попадает во вложенный объект.
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', None),
+    'image': ('image', _media_url),
+    'comment_count': ('comment_count', None),
+    'author.username': ('author__username', None),
+    'author.first_name': ('author__first_name', None),
+    'author.last_name': ('author__last_name', None),
+    'group.slug': ('group__slug', None),
+    'group.title': ('group__title', None),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'created': ('created', None),
+    'author.username': ('author__username', None),
+    'author.first_name': ('author__first_name', None),
+    'author.last_name': ('author__last_name', None),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def api_view(view):
+    """Только GET и HEAD; ошибки отдаются JSON-ом, а не страницей."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': 'Не найдено'}, status=404)
+        except BadRequest as error:
+            return JsonResponse({'detail': str(error)}, status=400)
+    return wrapper
+
+
+class _CsrfCheck(CsrfViewMiddleware):
+    def _reject(self, request, reason):
+        return reason
+
+
+def _basic_auth(request):
+    """(пользователь или None, был ли заголовок Authorization: Basic)."""
+    scheme, _, credentials = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'basic':
+        return None, False
+    try:
+        username, _, password = (
+            base64.b64decode(credentials).decode().partition(':'))
+    except (binascii.Error, UnicodeDecodeError):
+        return None, True
+    return authenticate(request, username=username, password=password), True
+
+
+def _unauthorized():
+    response = JsonResponse({'detail': 'Нужна авторизация'}, status=401)
+    response['WWW-Authenticate'] = 'Basic realm="api"'
+    return response
+
+
+def bulk_view(view):
+    """POST с телом {"items": [...]} от пользователя, вошедшего через
+    сессию (тогда нужен CSRF-токен) или HTTP Basic (для ботов и импорта,
+    без CSRF: браузер сам такой заголовок к чужому запросу не добавит).
+
+    Ответ — id созданных объектов и ошибки по номерам элементов;
+    201, если создан хотя бы один объект, иначе 400.
+    """
+    @csrf_exempt
+    @require_POST
+    @wraps(view)
+    def wrapper(request):
+        user, basic = _basic_auth(request)
+        if basic:
+            if user is None:
+                return _unauthorized()
+            request.user = user
+        elif not request.user.is_authenticated:
+            return _unauthorized()
+        else:
+            check = _CsrfCheck()
+            check.process_request(request)
+            reason = check.process_view(request, None, (), {})
+            if reason:
+                return JsonResponse({'detail': 'CSRF: ' + reason},
+                                    status=403)
+        try:
+            items = json.loads(request.body)['items']
+            if not isinstance(items, list):
+                raise TypeError(items)
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse(
+                {'detail': 'Ожидается JSON вида {"items": [...]}'},
+                status=400)
+        if len(items) > settings.API_BULK_MAX_ITEMS:
+            return JsonResponse(
+                {'detail': 'Не больше %d элементов за раз'
+                           % settings.API_BULK_MAX_ITEMS},
+                status=400)
+        created, errors = view(request, items)
+        return JsonResponse({
+            'created': [obj.pk for obj in created],
+            'errors': [{'index': index, 'errors': item_errors}
+                       for index, item_errors in sorted(errors.items())],
+        }, status=201 if created else 400)
+    return wrapper
+
+
+def select_fields(request, fields):
+    """Выбранные параметром fields поля в порядке описания ресурса."""
+    names = request.GET.get('fields')
+    if not names:
+        return list(fields)
+    wanted = {name.strip() for name in names.split(',') if name.strip()}
+    selected = [name for name in fields
+                if name in wanted or name.split('.')[0] in wanted]
+    unknown = wanted - set(selected) - {name.split('.')[0]
+                                        for name in selected}
+    if unknown:
+        raise BadRequest('Неизвестные поля: ' + ', '.join(sorted(unknown)))
+    return selected
+
+
+class Serializer:
+    """Переводит строки values() в словари по плану, собранному один раз."""
+
+    def __init__(self, fields, selected):
+        self.plan = []
+        self.nested = []
+        for name in selected:
+            path, convert = fields[name]
+            parent, _, child = name.rpartition('.')
+            if parent and parent not in self.nested:
+                self.nested.append(parent)
+            self.plan.append((parent, child, path, convert))
+        self.paths = [path for _, _, path, _ in self.plan]
+
+    def __call__(self, row):
+        item = {parent: {} for parent in self.nested}
+        for parent, child, path, convert in self.plan:
+            value = row[path]
+            if convert is not None:
+                value = convert(value)
+            (item[parent] if parent else item)[child] = value
+        for parent in self.nested:
+            # У поста без группы вместо словаря из None — просто None.
+            if all(value is None for value in item[parent].values()):
+                item[parent] = None
+        return item
+
+
+def _rows(queryset, serializer, date_field='pub_date'):
+    paths = ['pk', date_field]
+    paths += [path for path in serializer.paths if path not in paths]
+    return queryset.values(*paths)
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return min(max(size, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def _listing(request, paginator, serializer, **extra):
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse(dict(
+        extra,
+        count=paginator.count,
+        next=page.next_cursor,
+        previous=page.previous_cursor,
+        results=[serializer(row) for row in page],
+    ))
+
+
+def _post_listing(request, posts, count=None, **extra):
+    serializer = Serializer(POST_FIELDS, select_fields(request, POST_FIELDS))
+    paginator = CursorPaginator(_rows(posts, serializer), _page_size(request),
+                                count=count)
+    return _listing(request, paginator, serializer, **extra)
+
+
+@api_view
+@anonymous_fast_path
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def index(request):
+    return _post_listing(request, Post.objects.all(),
+                         count=estimated_post_count)
+
+
+@api_view
+@anonymous_fast_path
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def group_posts(request, slug):
+    group = get_object_or_404(
+        Group.objects.values('slug', 'title', 'description', 'post_count'),
+        slug=slug)
+    return _post_listing(request, Post.objects.filter(group__slug=slug),
+                         count=group['post_count'], group=group)
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Нужна авторизация'}, status=401)
+    serializer = Serializer(POST_FIELDS, select_fields(request, POST_FIELDS))
+    paginator = TimelinePaginator(request.user, _page_size(request),
+                                  posts=_rows(Post.objects.all(), serializer))
+    return _listing(request, paginator, serializer)
+
+
+@api_view
+@anonymous_fast_path
+@condition(etag_func=_author_etag)
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.values(
+            'id', 'username', 'first_name', 'last_name',
+            'stats__posts_count', 'stats__followers_count',
+            'stats__following_count'),
+        username=username)
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author_id=author['id']).exists()
+    # Без строки UserStats счётчики приходят как None.
+    posts_count = author['stats__posts_count'] or 0
+    return _post_listing(
+        request, Post.objects.filter(author_id=author['id']),
+        count=posts_count,
+        author={
+            'username': author['username'],
+            'first_name': author['first_name'],
+            'last_name': author['last_name'],
+            'posts_count': posts_count,
+            'followers_count': author['stats__followers_count'] or 0,
+            'following_count': author['stats__following_count'] or 0,
+            'following': following,
+        })
+
+
+@api_view
+@anonymous_fast_path
+@condition(etag_func=_author_etag)
+def post_view(request, username, post_id):
+    serializer = Serializer(POST_FIELDS, select_fields(request, POST_FIELDS))
+    row = get_object_or_404(
+        _rows(Post.objects.all(), serializer),
+        author__username=username, id=post_id)
+    return JsonResponse(serializer(row))
+
+
+@api_view
+@anonymous_fast_path
+@condition(etag_func=_author_etag)
+def comments(request, username, post_id):
+    post = get_object_or_404(
+        Post.objects.values('comment_count'),
+        author__username=username, id=post_id)
+    serializer = Serializer(COMMENT_FIELDS,
+                            select_fields(request, COMMENT_FIELDS))
+    rows = _rows(Comment.objects.filter(post_id=post_id), serializer,
+                 date_field='created')
+    paginator = CursorPaginator(rows, _page_size(request),
+                                date_field='created', descending=False,
+                                count=post['comment_count'])
+    return _listing(request, paginator, serializer)
+
+
+@bulk_view
+def bulk_posts(request, items):
+    return bulk.create_posts(request.user, items)
+
+
+@bulk_view
+def bulk_comments(request, items):
+    return bulk.create_comments(request.user, items)
@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('bulk/posts/', api.bulk_posts, name='bulk_posts'),
+    path('bulk/comments/', api.bulk_comments, name='bulk_comments'),
+    path('follow/', api.follow_index, name='follow_index'),
+    path('', api.index, name='index'),
+    path('group/<slug:slug>/', api.group_posts, name='group_posts'),
+    path('<str:username>/', api.profile, name='profile'),
+    path('<str:username>/<int:post_id>/', api.post_view, name='post'),
+    path('<str:username>/<int:post_id>/comments/', api.comments,
+         name='comments'),
+]
@@ -0,0 +1,127 @@
+"""Пакетное создание постов и комментариев.
+
+Элементы пакета проверяются теми же правилами, что формы NewForm и
+CommentForm, а прошедшие проверку вставляются через bulk_create в одной
+транзакции. bulk_create не вызывает сигналы, поэтому всё, что для
+одиночной записи делают обработчики posts.signals, — счётчики, ленты
+подписок, поисковые документы и версия ленты — выполняется здесь один
+раз на пакет.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from . import search, timeline
+from .cache import bump_feed_version
+from .counters import increment, shift_post_count
+from .forms import BulkPostForm, CommentForm
+from .models import Group, Post, UserStats
+
+# Ошибки в формате ErrorDict.get_json_data(), как и ошибки форм.
+NOT_AN_OBJECT = {'__all__': [{'message': 'Ожидается объект.',
+                              'code': 'invalid'}]}
+POST_NOT_FOUND = {'post': [{'message': 'Пост не найден.',
+                            'code': 'invalid_choice'}]}
+
+
+def _id(item, field):
+    try:
+        return int(item[field])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _ids(items, field):
+    return {_id(item, field) for item in items
+            if isinstance(item, dict)} - {None}
+
+
+def _insert(objects, owner_field, date_field):
+    model = type(objects[0])
+    model.objects.bulk_create(objects)
+    if objects[0].pk is not None:
+        return
+    # SQLite не возвращает id из bulk_create. Пакет вставлен в открытой
+    # транзакции, которая держит запись в базу, поэтому его строки —
+    # последние среди строк этого автора начиная с даты первой из них.
+    first = objects[0]
+    ids = list(
+        model.objects.filter(**{
+            owner_field: getattr(first, owner_field),
+            f'{date_field}__gte': getattr(first, date_field),
+        }).order_by('-pk').values_list('pk', flat=True)[:len(objects)]
+    )
+    for obj, pk in zip(objects, reversed(ids)):
+        obj.pk = pk
+        obj._state.adding = False
+
+
+def create_posts(author, items):
+    """Создаёт посты автора из пакета словарей {'text', 'group'}.
+
+    Возвращает созданные посты и ошибки {номер элемента: ошибки полей}.
+    """
+    groups = Group.objects.in_bulk(_ids(items, 'group'))
+    posts, errors = [], {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = NOT_AN_OBJECT
+            continue
+        form = BulkPostForm(item, groups=groups)
+        if not form.is_valid():
+            errors[index] = form.errors.get_json_data()
+            continue
+        post = form.save(commit=False)
+        post.author = author
+        posts.append(post)
+    if not posts:
+        return posts, errors
+
+    with transaction.atomic():
+        _insert(posts, 'author', 'pub_date')
+        increment(UserStats, author.pk, 'posts_count', len(posts))
+        for group_id, count in Counter(post.group_id for post in posts
+                                       if post.group_id).items():
+            increment(Group, group_id, 'post_count', count)
+        shift_post_count(len(posts))
+        timeline.fan_out(posts)
+        search.index_new_posts(posts)
+    bump_feed_version()
+    return posts, errors
+
+
+def create_comments(author, items):
+    """Создаёт комментарии автора из пакета словарей {'post', 'text'}.
+
+    Возвращает созданные комментарии и ошибки, как create_posts().
+    """
+    existing = set(Post.objects.filter(
+        pk__in=_ids(items, 'post')).values_list('pk', flat=True))
+    comments, errors = [], {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = NOT_AN_OBJECT
+            continue
+        form = CommentForm(item)
+        if not form.is_valid():
+            errors[index] = form.errors.get_json_data()
+            continue
+        post_id = _id(item, 'post')
+        if post_id not in existing:
+            errors[index] = POST_NOT_FOUND
+            continue
+        comment = form.save(commit=False)
+        comment.post_id = post_id
+        comment.author = author
+        comments.append(comment)
+    if not comments:
+        return comments, errors
+
+    with transaction.atomic():
+        _insert(comments, 'author', 'created')
+        for post_id, count in Counter(
+                comment.post_id for comment in comments).items():
+            increment(Post, post_id, 'comment_count', count)
+        search.index_new_comments(comments)
+    bump_feed_version()
+    return comments, errors
@@ -0,0 +1,50 @@
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+FEED_VERSION_KEY = 'posts:feed_version'
+FEED_MODIFIED_KEY = 'posts:feed_modified'
+VERSION_KEY = 'posts:version:{}:{}'
+
+
+def _initial_version():
+    # Начинаем со времени, чтобы после вытеснения ключа из кэша версия
+    # не совпала с одной из уже использованных.
+    return int(time.time() * 1000)
+
+
+def version_key(kind, pk):
+    return VERSION_KEY.format(kind, pk)
+
+
+def get_versions(keys):
+    """Текущие версии по ключам; недостающие создаются."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if versions.get(key) is None:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+def get_feed_version():
+    return get_versions([FEED_VERSION_KEY])[FEED_VERSION_KEY]
+
+
+def get_feed_modified():
+    """Время последнего изменения ленты или None, если неизвестно."""
+    return cache.get(FEED_MODIFIED_KEY)
+
+
+def bump_feed_version():
+    bump_version(FEED_VERSION_KEY)
+    cache.set(FEED_MODIFIED_KEY, timezone.now().replace(microsecond=0),
+              None)
@@ -0,0 +1,73 @@
+"""Кэш отрисованных карточек постов.
+
+HTML карточки зависит только от поста, его автора, группы и числа
+комментариев, поэтому хранится под ключом из id поста, comment_count и
+версий поста, автора и группы; версии увеличивают сигналы posts.
+Кнопка редактирования зависит от зрителя и подставляется в готовый HTML
+на место EDIT_SLOT. Карточки с ещё не готовой миниатюрой не кэшируются,
+чтобы заглушка не пережила генерацию.
+
+Внутри общего для всех зрителей кэша фрагмента на месте кнопки остаётся
+метка с автором и постом; fill_edit_slots() заменяет метки уже после
+кэша, так что попадание в кэш не требует загружать страницу ленты.
+"""
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .cache import get_versions, version_key
+from .models import Post
+from .thumbnails import card_picture
+
+CARD_KEY = 'posts:card:{}:{}:{}'
+EDIT_SLOT = '<!-- card-edit -->'
+DEFERRED_EDIT_SLOT = '<!-- card-edit {} {} -->'
+DEFERRED_EDIT_RE = re.compile(r'<!-- card-edit (\d+) (\d+) -->')
+
+
+def card_version_keys(post):
+    return [
+        version_key('post', post.pk),
+        version_key('user', post.author_id),
+        version_key('group', post.group_id),
+    ]
+
+
+def render_edit(post):
+    return get_template('includes/card_post_edit.html').render(
+        {'post': post})
+
+
+def render_card(post, user=None, defer_edit=False):
+    keys = card_version_keys(post)
+    versions = get_versions(keys)
+    key = CARD_KEY.format(post.pk, post.comment_count,
+                          ':'.join(str(versions[k]) for k in keys))
+    html = cache.get(key)
+    if html is None:
+        picture = card_picture(post.image)
+        html = get_template('includes/card_post_body.html').render(
+            {'post': post, 'picture': picture})
+        if picture or not post.image:
+            cache.set(key, html, settings.CARD_CACHE_TIMEOUT)
+
+    edit = ''
+    if defer_edit:
+        edit = DEFERRED_EDIT_SLOT.format(post.author_id, post.pk)
+    elif user is not None and user.pk == post.author_id:
+        edit = render_edit(post)
+    return mark_safe(html.replace(EDIT_SLOT, edit, 1))
+
+
+def fill_edit_slots(html, user):
+    """Кнопки редактирования для постов зрителя на месте отложенных меток,
+    остальные метки убираются."""
+    def replace(match):
+        author_id, post_id = map(int, match.groups())
+        if not user.is_authenticated or user.pk != author_id:
+            return ''
+        return render_edit(Post(pk=post_id, author=user))
+    return DEFERRED_EDIT_RE.sub(replace, html)
@@ -0,0 +1,86 @@
+"""Денормализованные счётчики и их сверка с реальными данными."""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+POST_COUNT_KEY = 'posts:count'
+
+
+def increment(model, pk, field, delta=1):
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def estimated_post_count():
+    """Число всех постов для подписи «около N» без COUNT(*) по постам.
+
+    Значение складывается из счётчиков авторов UserStats.posts_count и
+    живёт в кэше POST_COUNT_TIMEOUT секунд; создание и удаление постов
+    сдвигают его. Срок жизни нужен, чтобы сдвиги в локальном кэше
+    процесса, который не видит других воркеров, не копились бесконечно.
+    """
+    count = cache.get(POST_COUNT_KEY)
+    if count is None:
+        count = UserStats.objects.aggregate(
+            total=Sum('posts_count'))['total'] or 0
+        cache.add(POST_COUNT_KEY, count, settings.POST_COUNT_TIMEOUT)
+    return count
+
+
+def shift_post_count(delta):
+    try:
+        cache.incr(POST_COUNT_KEY, delta)
+    except ValueError:
+        # Ключа нет — следующее чтение снова сложит счётчики авторов.
+        pass
+
+
+def _count(queryset, field):
+    counted = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+COUNTERS = (
+    (UserStats, 'followers_count',
+     lambda: _count(Follow.objects.all(), 'author')),
+    (UserStats, 'following_count',
+     lambda: _count(Follow.objects.all(), 'user')),
+    (UserStats, 'posts_count', lambda: _count(Post.objects.all(), 'author')),
+    (Post, 'comment_count', lambda: _count(Comment.objects.all(), 'post')),
+    (Group, 'post_count', lambda: _count(Post.objects.all(), 'group')),
+)
+
+
+def reconcile():
+    """Исправляет разошедшиеся счётчики.
+
+    Возвращает {'Model.field': число исправленных строк}.
+    """
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    UserStats.objects.bulk_create(UserStats(user_id=pk) for pk in missing)
+
+    fixed = {}
+    for model, field, actual in COUNTERS:
+        drifted = list(
+            model.objects.annotate(actual=actual())
+            .exclude(**{field: F('actual')})
+            .values_list('pk', flat=True)
+        )
+        if drifted:
+            model.objects.filter(pk__in=drifted).update(**{field: actual()})
+        fixed[f'{model.__name__}.{field}'] = len(drifted)
+    cache.set(POST_COUNT_KEY, Post.objects.count(),
+              settings.POST_COUNT_TIMEOUT)
+    return fixed
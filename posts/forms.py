@@ -3,12 +3,51 @@ from django import forms
 from .models import Comment, Post
 
 
+class PreloadedChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField, который ищет выбранный объект в заранее
+    загруженном словаре {pk: объект}, а не запросом на каждое значение."""
+
+    def __init__(self, objects, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice')
+
+
 class NewForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('group', 'text', 'image')
 
 
+class BulkPostForm(NewForm):
+    """NewForm для пакетной загрузки: без картинки, а группы пакета
+    загружены заранее одним запросом."""
+
+    class Meta(NewForm.Meta):
+        fields = ('group', 'text')
+
+    def __init__(self, *args, groups, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields['group']
+        self.fields['group'] = PreloadedChoiceField(
+            groups, queryset=field.queryset, required=field.required,
+            label=field.label, help_text=field.help_text)
+
+    def _get_validation_exclusions(self):
+        # Группа уже найдена среди загруженных — ForeignKey.validate()
+        # проверял бы её в базе ещё раз для каждого поста.
+        return super()._get_validation_exclusions() + ['group']
+
+
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
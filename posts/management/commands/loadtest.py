@@ -0,0 +1,301 @@
+"""Нагрузочный прогон через yatube.wsgi.application.
+
+    python manage.py loadtest --seed --requests 2000 --concurrency 8 \\
+        --output benchmarks/load.json
+
+Запросы идут прямо в WSGI-приложение из нескольких потоков, минуя сеть,
+так что в отчёт попадает время Django, шаблонов и базы. Отчёт — JSON с
+p50/p95/p99, пропускной способностью и ошибками по каждому маршруту
+(error_kinds: статус ответа или класс исключения → число); ключи
+отсортированы, чтобы файлы разных релизов удобно было сравнивать diff-ом.
+"""
+import io
+import json
+import math
+import platform
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from posts.seeding import seed
+
+# Маршрут: доля в смеси запросов по умолчанию.
+MIX = {
+    'index': 30,
+    'post': 20,
+    'profile': 15,
+    'group_posts': 10,
+    'follow_index': 10,
+    'search': 5,
+    'add_comment': 5,
+    'new_post': 5,
+}
+
+SEARCH_WORDS = ('post', 'group', 'comment', 'привет', 'лето')
+
+
+def percentile(values, rank):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in MIX or not weight.isdigit():
+            raise CommandError(
+                f'Неверный элемент смеси «{item}», ожидается '
+                f'маршрут=вес, маршруты: {", ".join(MIX)}')
+        mix[name] = int(weight)
+    return mix
+
+
+class WsgiClient:
+    """Минимальный WSGI-клиент: окружение собирается вручную, как у
+    настоящего сервера, без test.Client и его сигналов."""
+
+    def __init__(self, application):
+        self.application = application
+
+    def request(self, method, path, query=None, data=None, cookies=None):
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(query or {}),
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if cookies:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in cookies.items())
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = headers
+
+        result = self.application(environ, start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers']
+
+
+class Session:
+    """Вошедший пользователь: cookie сессии и CSRF-токен для POST."""
+
+    csrf_token = ''
+
+    def __init__(self, client, user):
+        login = Client()
+        login.force_login(user)
+        self.user = user
+        self.cookies = {
+            settings.SESSION_COOKIE_NAME:
+                login.cookies[settings.SESSION_COOKIE_NAME].value,
+        }
+        _, headers = client.request('GET', reverse('new_post'),
+                                    cookies=self.cookies)
+        for name, value in headers:
+            if name.lower() != 'set-cookie':
+                continue
+            cookie = SimpleCookie(value)
+            if settings.CSRF_COOKIE_NAME in cookie:
+                self.csrf_token = cookie[settings.CSRF_COOKIE_NAME].value
+                self.cookies[settings.CSRF_COOKIE_NAME] = self.csrf_token
+
+    def form(self, **data):
+        return dict(data, csrfmiddlewaretoken=self.csrf_token)
+
+
+class Command(BaseCommand):
+    help = ('Генерирует граф пользователей и нагружает сайт смесью '
+            'запросов через WSGI, печатая p50/p95/p99 по маршрутам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+                            help='сначала сгенерировать данные')
+        parser.add_argument('--prefix', default='load',
+                            help='префикс имён и slug-ов генерируемых данных')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=50,
+                            help='запросы до замера, в отчёт не входят')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--sessions', type=int, default=20,
+                            help='сколько вошедших пользователей в смеси')
+        parser.add_argument('--mix', type=parse_mix,
+                            help='веса маршрутов, например index=5,post=1')
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--output', help='куда записать отчёт в JSON')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            if options['users'] < 2:
+                raise CommandError('Для подписок нужно --users не меньше 2')
+            prefix = options['prefix']
+            if User.objects.filter(
+                    username__startswith=f'{prefix}_user_').exists():
+                raise CommandError(
+                    f'Данные с префиксом «{prefix}» уже есть, '
+                    'укажите другой --prefix')
+            started = time.perf_counter()
+            seed(options['users'], options['groups'], options['posts'],
+                 options['comments'], options['follows'], prefix=prefix,
+                 random_seed=options['random_seed'])
+            self.stderr.write(
+                f'Данные созданы за {time.perf_counter() - started:.1f} с')
+
+        from yatube.wsgi import application
+        client = WsgiClient(application)
+        plan = self.make_plan(client, options)
+
+        for index in range(-options['warmup'], 0):
+            plan(index)
+        results = []
+        lock = threading.Lock()
+
+        def run(index):
+            result = plan(index)
+            with lock:
+                results.append(result)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            list(executor.map(run, range(options['requests'])))
+        duration = time.perf_counter() - started
+
+        report = self.report(results, duration, options)
+        text = json.dumps(report, indent=2, sort_keys=True,
+                          ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text + '\n')
+        self.stdout.write(text)
+
+    def make_plan(self, client, options):
+        """Функция «номер запроса → (маршрут, мс, статус)»; выбор маршрута
+        и его аргументов зависит только от номера и --random-seed. Вместо
+        статуса может быть имя класса исключения."""
+        posts = list(
+            Post.objects.order_by('?').values_list('author__username', 'id')
+            [:1000])
+        usernames = sorted({username for username, _ in posts})
+        slugs = list(Group.objects.values_list('slug', flat=True)[:1000])
+        users = User.objects.filter(
+            stats__following_count__gt=0).order_by('?')
+        sessions = [Session(client, user)
+                    for user in users[:options['sessions']]]
+        if not posts or not sessions:
+            raise CommandError('Нет данных для нагрузки, запустите с --seed')
+        connection.close()
+
+        mix = options['mix'] or MIX
+        if not slugs:
+            mix = {name: weight for name, weight in mix.items()
+                   if name != 'group_posts'}
+        routes, weights = zip(*mix.items())
+        random_seed = options['random_seed']
+
+        def plan(index):
+            rng = random.Random(f'{random_seed}:{index}')
+            route = rng.choices(routes, weights)[0]
+            session = rng.choice(sessions)
+            username, post_id = rng.choice(posts)
+            method, data, query = 'GET', None, None
+            if route == 'index':
+                path = reverse('index')
+            elif route == 'post':
+                path = reverse('post', args=[username, post_id])
+            elif route == 'profile':
+                path = reverse('profile', args=[rng.choice(usernames)])
+            elif route == 'group_posts':
+                path = reverse('group_posts', args=[rng.choice(slugs)])
+            elif route == 'follow_index':
+                path = reverse('follow_index')
+            elif route == 'search':
+                path = reverse('search')
+                query = {'q': rng.choice(SEARCH_WORDS)}
+            elif route == 'add_comment':
+                method = 'POST'
+                path = reverse('add_comment', args=[username, post_id])
+                data = session.form(text=f'loadtest comment {index}')
+            else:
+                method = 'POST'
+                path = reverse('new_post')
+                data = session.form(text=f'loadtest post {index}')
+            started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, query, data,
+                                           session.cookies)
+            except Exception as error:
+                # Исключение, дошедшее до сервера, — в отчёт по имени класса.
+                status = type(error).__name__
+            return route, (time.perf_counter() - started) * 1000, status
+
+        return plan
+
+    def report(self, results, duration, options):
+        by_route = {}
+        for route, elapsed, status in results:
+            by_route.setdefault(route, []).append((elapsed, status))
+        routes = {}
+        for route, samples in by_route.items():
+            timings = sorted(elapsed for elapsed, _ in samples)
+            failures = Counter(
+                str(status) for _, status in samples
+                if isinstance(status, str) or status >= 400)
+            routes[route] = {
+                'requests': len(samples),
+                'errors': sum(failures.values()),
+                'error_kinds': dict(failures),
+                'throughput_rps': round(len(samples) / duration, 2),
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'p99_ms': round(percentile(timings, 99), 2),
+                'max_ms': round(timings[-1], 2),
+            }
+        return {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'requests': len(results),
+            'concurrency': options['concurrency'],
+            'duration_s': round(duration, 2),
+            'throughput_rps': round(len(results) / duration, 2),
+            'routes': routes,
+        }
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с данными и исправляет их'
+
+    def handle(self, *args, **options):
+        for counter, fixed in reconcile().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
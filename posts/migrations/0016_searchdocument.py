@@ -0,0 +1,98 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE posts_search_fts USING fts5("
+    "title, body, content='posts_searchdocument', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_search_ai AFTER INSERT ON posts_searchdocument "
+    "BEGIN INSERT INTO posts_search_fts(rowid, title, body) "
+    "VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER posts_search_ad AFTER DELETE ON posts_searchdocument "
+    "BEGIN INSERT INTO posts_search_fts(posts_search_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER posts_search_au AFTER UPDATE ON posts_searchdocument "
+    "BEGIN INSERT INTO posts_search_fts(posts_search_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO posts_search_fts(rowid, title, body) "
+    "VALUES (new.id, new.title, new.body); END",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS posts_search_ai',
+    'DROP TRIGGER IF EXISTS posts_search_ad',
+    'DROP TRIGGER IF EXISTS posts_search_au',
+    'DROP TABLE IF EXISTS posts_search_fts',
+]
+POSTGRES_FORWARD = [
+    "CREATE INDEX posts_search_vector ON posts_searchdocument "
+    "USING GIN (to_tsvector('russian', title || ' ' || body))",
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS posts_search_vector',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+def fill_documents(apps, schema_editor):
+    SearchDocument = apps.get_model('posts', 'SearchDocument')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Group = apps.get_model('posts', 'Group')
+
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind='post', object_id=pk, post_id=pk, body=text)
+        for pk, text in Post.objects.values_list('pk', 'text').iterator()
+    )
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind='comment', object_id=pk, post_id=post_id,
+                       body=text)
+        for pk, post_id, text
+        in Comment.objects.values_list('pk', 'post_id', 'text').iterator()
+    )
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind='group', object_id=pk, group_id=pk, title=title,
+                       body=description)
+        for pk, title, description
+        in Group.objects.values_list('pk', 'title', 'description')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий'), ('group', 'Группа')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Group')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_documents'),
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD,
+                            'postgresql': POSTGRES_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_BACKWARD,
+                            'postgresql': POSTGRES_BACKWARD}),
+        ),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+    ]
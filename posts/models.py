@@ -4,6 +4,13 @@ from django.db import models
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для ленты: автор и группа одним JOIN, чтобы карточка
+        поста не делала своих запросов."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст', help_text='Напишите текст')
     pub_date = models.DateTimeField('date published', auto_now_add=True)
@@ -17,12 +24,24 @@ class Post(models.Model):
     image = models.ImageField(upload_to='posts/', blank=True, null=True,
                               verbose_name='Изображение',
                               help_text='Выберите файл изображения',)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ["-pub_date"]
+        # Ленты листаются по ключу (pub_date, id), см. posts.paginators
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='post_pub_date_id'),
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_pub_date_id'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_pub_date_id'),
+        ]
 
 
 class Group(models.Model):
@@ -30,6 +49,7 @@ class Group(models.Model):
                              help_text="Наименование группы")
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    post_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
@@ -48,6 +68,12 @@ class Comment(models.Model):
     created = models.DateTimeField(auto_now_add=True,
                                    verbose_name='Дата создания комментария',)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_id'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -62,3 +88,64 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_followings'),
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user'),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats',)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    posts_count = models.PositiveIntegerField(default=0)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline',)
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',)
+    # Копия Post.pub_date: лента читается по индексу без JOIN с постами.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entries'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='timeline_user_pub_date'),
+        ]
+
+
+class SearchDocument(models.Model):
+    POST = 'post'
+    COMMENT = 'comment'
+    GROUP = 'group'
+    KINDS = (
+        (POST, 'Пост'),
+        (COMMENT, 'Комментарий'),
+        (GROUP, 'Группа'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, blank=True,
+                             null=True, related_name='+',)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, blank=True,
+                              null=True, related_name='+',)
+    title = models.CharField(max_length=200, blank=True)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'],
+                                    name='unique_search_documents'),
+        ]
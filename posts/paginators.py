@@ -0,0 +1,271 @@
+import base64
+import binascii
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# Курсор последней страницы: обход с конца ленты без ключа.
+LAST = 'last'
+
+
+class PageLink(namedtuple('PageLink', 'number cursor current')):
+    """Ссылка в окне страниц.
+
+    Номер считается от начала ленты, а у страниц, открытых от последней,
+    пока окно не дотянулось до начала, — от конца: -1, -2, … None —
+    номер неизвестен (курсор без номера).
+    """
+
+    @property
+    def label(self):
+        if self.number is None:
+            return '·'
+        if self.number == -1:
+            return 'Последняя'
+        if self.number < 0:
+            return f'{-self.number}-я с конца'
+        return str(self.number)
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 number=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.number = number
+
+    @classmethod
+    def deferred(cls, load):
+        """Страница, которую load() загрузит при первом обращении к ней."""
+        page = cls.__new__(cls)
+        page._load = load
+        return page
+
+    def __getattr__(self, name):
+        # Сюда попадают только ещё не заданные атрибуты; у отложенной
+        # страницы до загрузки это все атрибуты.
+        load = self.__dict__.pop('_load', None)
+        if load is None:
+            raise AttributeError(name)
+        self.__dict__.update(vars(load()))
+        return getattr(self, name)
+
+    def __repr__(self):
+        return '<CursorPage of %d items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _neighbour(self, offset):
+        return self.number + offset if self.number else None
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(
+            NEXT, self.object_list[-1], self._neighbour(1))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(
+            PREVIOUS, self.object_list[0], self._neighbour(-1))
+
+    @cached_property
+    def window(self):
+        """Ссылки для переключателя страниц, None — пропуск («…»)."""
+        return self.paginator.get_window(self)
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (date_field, id) вместо OFFSET.
+
+    Курсор хранит направление и ключ крайнего объекта страницы, поэтому
+    любая страница — это один поиск по индексу без COUNT(*).
+    """
+
+    # Сколько соседних страниц показывать по обе стороны от текущей.
+    window_size = 2
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 descending=True, count=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.date_field = date_field
+        self.descending = descending
+        self._count = count
+
+    @cached_property
+    def count(self):
+        """Примерное число объектов или None.
+
+        Точный COUNT(*) не делается: число передаёт вызывающий — значение
+        счётчика или функцию оценки, которая вызовется, только если число
+        понадобится шаблону.
+        """
+        return self._count() if callable(self._count) else self._count
+
+    def key_of(self, obj):
+        """Ключ (дата, pk) объекта или строки values(), где есть 'pk'."""
+        if isinstance(obj, dict):
+            return obj[self.date_field], obj['pk']
+        return getattr(obj, self.date_field), obj.pk
+
+    def encode_cursor(self, direction, obj, number=None):
+        return self._encode(direction, *self.key_of(obj), number)
+
+    def _encode(self, direction, key, pk, number):
+        raw = f'{direction}|{key.isoformat()}|{pk}'
+        if number:
+            raw += f'|{number}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """(направление, ключ, pk, номер страницы или None) либо None."""
+        if cursor == LAST:
+            return PREVIOUS, None, None, -1
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            direction, key, pk, *number = raw.split('|')
+            if direction not in (NEXT, PREVIOUS) or len(number) > 1:
+                raise ValueError(direction)
+            number = int(number[0]) if number else None
+            if number == 0:
+                raise ValueError(number)
+            return direction, datetime.fromisoformat(key), int(pk), number
+        except (binascii.Error, UnicodeError, ValueError):
+            return None
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору; неверный курсор — первая
+        страница, как Paginator.get_page() для неверного номера."""
+        decoded = self.decode_cursor(cursor) if cursor else None
+        direction, key, pk, number = decoded or (NEXT, None, None, 1)
+        items = self.fetch(direction, key, pk)
+        page_items = items[:self.per_page]
+        more = len(items) > self.per_page
+        if direction == NEXT:
+            return CursorPage(page_items, self, more, decoded is not None,
+                              number)
+        page_items.reverse()
+        return CursorPage(page_items, self, key is not None, more, number)
+
+    def get_deferred_page(self, cursor):
+        """Как get_page(), но запрос выполняется при первом обращении к
+        странице: шаблон, взявший её разметку из кэша, базу не трогает."""
+        return CursorPage.deferred(lambda: self.get_page(cursor))
+
+    def fetch(self, direction, key, pk):
+        """До per_page + 1 объектов за ключом в порядке обхода."""
+        queryset = keyset(self.object_list, direction, key, pk,
+                          self.date_field, descending=self.descending)
+        return list(queryset[:self.per_page + 1])
+
+    def fetch_keys(self, direction, key, pk, limit):
+        """До limit ключей (дата, pk) за ключом в порядке обхода."""
+        queryset = keyset(self.object_list, direction, key, pk,
+                          self.date_field, descending=self.descending)
+        return list(queryset.values_list(self.date_field, 'pk')[:limit])
+
+    def get_window(self, page):
+        """Первая и последняя страницы и по window_size соседей текущей.
+
+        Ключи соседей читаются заранее — не больше
+        window_size * per_page + 1 в каждую сторону, — так что цена окна
+        не зависит от длины ленты. Номера страниц едут в курсорах; если
+        окно дотянулось до начала ленты, номер текущей страницы уточняется
+        по числу ключей перед ней.
+        """
+        if not page.has_other_pages():
+            return []
+        size, per_page = self.window_size, self.per_page
+        limit = size * per_page + 1
+        first = self.key_of(page.object_list[0])
+        last = self.key_of(page.object_list[-1])
+        behind = ahead = []
+        if page.has_previous():
+            behind = self.fetch_keys(PREVIOUS, *first, limit)
+        if page.has_next():
+            ahead = self.fetch_keys(NEXT, *last, limit)
+
+        number = page.number
+        if len(behind) < limit:
+            number = -(-len(behind) // per_page) + 1
+
+        def numbered(offset):
+            return number + offset if number else None
+
+        links = []
+        if len(behind) == limit:
+            links += [PageLink(1, None, False), None]
+        for offset in range(size, 0, -1):
+            if len(behind) <= (offset - 1) * per_page:
+                continue
+            if len(behind) <= offset * per_page:
+                # Эта страница упирается в начало ленты — это первая.
+                links.append(PageLink(1, None, False))
+                continue
+            key = behind[(offset - 1) * per_page - 1] if offset > 1 \
+                else first
+            links.append(PageLink(
+                numbered(-offset), self._encode(
+                    PREVIOUS, *key, numbered(-offset)), False))
+        links.append(PageLink(number, None, True))
+        for offset in range(1, size + 1):
+            if len(ahead) <= (offset - 1) * per_page:
+                break
+            key = ahead[(offset - 1) * per_page - 1] if offset > 1 \
+                else last
+            links.append(PageLink(
+                numbered(offset), self._encode(
+                    NEXT, *key, numbered(offset)), False))
+        if len(ahead) == limit:
+            links += [None, PageLink(-1, LAST, False)]
+        return links
+
+
+def keyset(queryset, direction, key, pk, date_field, key_field='pk',
+           descending=True):
+    """Отбирает объекты строго после ключа (key, pk) в направлении обхода.
+
+    NEXT идёт от новых к старым (при descending=False — от старых к новым),
+    PREVIOUS — в обратную сторону; без ключа возвращается начало ленты.
+    """
+    if (direction == NEXT) == descending:
+        lookup, ordering = 'lt', (f'-{date_field}', f'-{key_field}')
+    else:
+        lookup, ordering = 'gt', (date_field, key_field)
+    if key is not None:
+        # Нестрогое сравнение с датой ключа на вид лишнее, но даёт базе
+        # границу диапазона: без него SQLite не ищет по индексу, а
+        # просматривает его с начала ленты, и дальние страницы дороже.
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}e': key}),
+            Q(**{f'{date_field}__{lookup}': key})
+            | Q(**{date_field: key, f'{key_field}__{lookup}': pk})
+        )
+    return queryset.order_by(*ordering)
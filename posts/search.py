@@ -0,0 +1,161 @@
+"""Полнотекстовый поиск по постам, комментариям и группам.
+
+Индексируемый текст хранится в SearchDocument и обновляется сигналами.
+Сам поиск выполняет бэкенд из настройки SEARCH_BACKEND: FTS5 для SQLite
+(таблица posts_search_fts синхронизируется с SearchDocument триггерами),
+tsvector с GIN-индексом для PostgreSQL или простой LIKE для остальных.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from .models import Group, Post, SearchDocument
+
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SearchHit = namedtuple('SearchHit', 'kind post group snippet')
+
+
+class SearchBackend:
+    def search(self, query, offset, limit):
+        """Список (id документа, сниппет) в порядке релевантности."""
+        raise NotImplementedError
+
+
+class SqliteFtsBackend(SearchBackend):
+    sql = (
+        'SELECT rowid, snippet(posts_search_fts, -1, %s, %s, %s, 16) '
+        'FROM posts_search_fts WHERE posts_search_fts MATCH %s '
+        'ORDER BY bm25(posts_search_fts, 2.0, 1.0) LIMIT %s OFFSET %s'
+    )
+
+    def search(self, query, offset, limit):
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+        match = ' '.join('"{}"*'.format(term) for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(self.sql, [MARK_START, MARK_END, '…', match,
+                                      limit, offset])
+            return cursor.fetchall()
+
+
+class PostgresBackend(SearchBackend):
+    # Выражение должно совпадать с индексом posts_search_vector из миграции.
+    sql = (
+        "SELECT id, ts_headline('russian', body, query, %s) "
+        "FROM posts_searchdocument, plainto_tsquery('russian', %s) query "
+        "WHERE to_tsvector('russian', title || ' ' || body) @@ query "
+        "ORDER BY ts_rank(to_tsvector('russian', title || ' ' || body), "
+        "query) DESC, id DESC LIMIT %s OFFSET %s"
+    )
+
+    def search(self, query, offset, limit):
+        options = f'StartSel={MARK_START}, StopSel={MARK_END}'
+        with connection.cursor() as cursor:
+            cursor.execute(self.sql, [options, query, limit, offset])
+            return cursor.fetchall()
+
+
+class SimpleBackend(SearchBackend):
+    def search(self, query, offset, limit):
+        documents = SearchDocument.objects.filter(body__icontains=query) | (
+            SearchDocument.objects.filter(title__icontains=query))
+        documents = documents.order_by('-id')[offset:offset + limit]
+        return [(pk, body[:200]) for pk, body
+                in documents.values_list('pk', 'body')]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def search(query, page_number, per_page):
+    """Страница результатов и признак, есть ли следующая."""
+    offset = (page_number - 1) * per_page
+    rows = get_backend().search(query, offset, per_page + 1)
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    documents = SearchDocument.objects.in_bulk([pk for pk, _ in rows])
+    posts = Post.objects.feed().in_bulk(
+        [doc.post_id for doc in documents.values() if doc.post_id])
+    groups = Group.objects.in_bulk(
+        [doc.group_id for doc in documents.values() if doc.group_id])
+
+    hits = []
+    for pk, snippet in rows:
+        document = documents.get(pk)
+        if document is None:
+            continue
+        hits.append(SearchHit(
+            kind=document.kind,
+            post=posts.get(document.post_id),
+            group=groups.get(document.group_id),
+            snippet=highlight(snippet),
+        ))
+    return hits, has_next
+
+
+def highlight(snippet):
+    text = escape(snippet or '')
+    text = text.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(text)
+
+
+def index_post(post, created=False):
+    # Документа нового поста ещё нет: простая вставка вместо чтения перед
+    # записью, которое на SQLite держит транзакцию дольше и упирается в
+    # блокировку базы при параллельных записях.
+    if created:
+        index_new_posts([post])
+        return
+    SearchDocument.objects.update_or_create(
+        kind=SearchDocument.POST, object_id=post.pk,
+        defaults={'post': post, 'body': post.text},
+    )
+
+
+def index_comment(comment, created=False):
+    if created:
+        index_new_comments([comment])
+        return
+    SearchDocument.objects.update_or_create(
+        kind=SearchDocument.COMMENT, object_id=comment.pk,
+        defaults={'post_id': comment.post_id, 'body': comment.text},
+    )
+
+
+def index_new_posts(posts):
+    """Документы для только что созданных постов — одной вставкой."""
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind=SearchDocument.POST, object_id=post.pk,
+                       post=post, body=post.text)
+        for post in posts)
+
+
+def index_new_comments(comments):
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind=SearchDocument.COMMENT, object_id=comment.pk,
+                       post_id=comment.post_id, body=comment.text)
+        for comment in comments)
+
+
+def index_group(group):
+    SearchDocument.objects.update_or_create(
+        kind=SearchDocument.GROUP, object_id=group.pk,
+        defaults={'group': group, 'title': group.title,
+                  'body': group.description},
+    )
+
+
+def remove(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
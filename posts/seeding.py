@@ -0,0 +1,93 @@
+"""Синтетический социальный граф для тестов производительности и нагрузки.
+
+Всё вставляется через bulk_create, поэтому сигналы не срабатывают:
+статистика пользователей, ленты подписок и поисковые документы
+заполняются здесь явно, а счётчики сверяются в конце через reconcile().
+"""
+import random
+from collections import Counter
+
+from django.conf import settings
+
+from .counters import reconcile
+from .models import (Comment, Follow, Group, Post, SearchDocument,
+                     TimelineEntry, User, UserStats)
+
+
+def seed(users=2000, groups=20, posts=10000, comments=20000,
+         follows=10000, prefix='perf', random_seed=2021):
+    """Создаёт граф заданного размера; prefix отделяет его имена и slug-и
+    от уже существующих данных."""
+    rng = random.Random(random_seed)
+    User.objects.bulk_create(
+        User(username=f'{prefix}_user_{i}') for i in range(users))
+    user_ids = list(User.objects.filter(
+        username__startswith=f'{prefix}_user_').values_list('id', flat=True))
+    UserStats.objects.bulk_create(
+        UserStats(user_id=pk) for pk in user_ids)
+
+    Group.objects.bulk_create(
+        Group(title=f'{prefix} group {i}', slug=f'{prefix}-group-{i}',
+              description='')
+        for i in range(groups))
+    group_ids = list(Group.objects.filter(
+        slug__startswith=f'{prefix}-group-').values_list('id', flat=True))
+    group_ids.append(None)
+
+    Post.objects.bulk_create(
+        Post(text=f'{prefix} post {i}', author_id=rng.choice(user_ids),
+             group_id=rng.choice(group_ids))
+        for i in range(posts))
+    post_rows = list(
+        Post.objects.filter(author_id__in=user_ids)
+        .values_list('id', 'author_id', 'pub_date', 'text'))
+    Comment.objects.bulk_create(
+        Comment(text=f'{prefix} comment', author_id=rng.choice(user_ids),
+                post_id=rng.choice(post_rows)[0])
+        for _ in range(comments))
+
+    pairs = set()
+    follows = min(follows, len(user_ids) * (len(user_ids) - 1))
+    while len(pairs) < follows:
+        pairs.add(tuple(rng.sample(user_ids, 2)))
+    Follow.objects.bulk_create(
+        Follow(user_id=user, author_id=author) for user, author in pairs)
+
+    _fill_timelines(pairs, post_rows)
+    _fill_search(post_rows, group_ids[:-1], user_ids)
+    reconcile()
+
+
+def _fill_timelines(pairs, post_rows):
+    # Те же правила, что у timeline.fan_out: популярных авторов не
+    # раскладываем, а от остальных берём не больше лимита последних постов.
+    followers = Counter(author for _, author in pairs)
+    by_author = {}
+    for post_id, author_id, pub_date, _ in sorted(
+            post_rows, key=lambda row: row[2], reverse=True):
+        by_author.setdefault(author_id, []).append((post_id, pub_date))
+    TimelineEntry.objects.bulk_create(
+        TimelineEntry(user_id=user, post_id=post_id, pub_date=pub_date)
+        for user, author in pairs
+        if followers[author] <= settings.TIMELINE_FANOUT_LIMIT
+        for post_id, pub_date
+        in by_author.get(author, [])[:settings.TIMELINE_BACKFILL_LIMIT])
+
+
+def _fill_search(post_rows, group_ids, user_ids):
+    # Те же документы, что создают сигналы через posts.search.
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind=SearchDocument.POST, object_id=post_id,
+                       post_id=post_id, body=text)
+        for post_id, _, _, text in post_rows)
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind=SearchDocument.COMMENT, object_id=comment_id,
+                       post_id=post_id, body=text)
+        for comment_id, post_id, text in Comment.objects.filter(
+            author_id__in=user_ids).values_list('id', 'post_id', 'text')
+        .iterator())
+    SearchDocument.objects.bulk_create(
+        SearchDocument(kind=SearchDocument.GROUP, object_id=group.pk,
+                       group=group, title=group.title,
+                       body=group.description)
+        for group in Group.objects.filter(pk__in=group_ids))
@@ -0,0 +1,157 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search, thumbnails, timeline
+from .cache import bump_feed_version, bump_version, version_key
+from .counters import increment, shift_post_count
+from .models import (Comment, Follow, Group, Post, SearchDocument, User,
+                     UserStats)
+
+# Порядок обработчиков важен: сначала счётчики (по ним timeline решает,
+# раскладывать ли пост), затем ленты, миниатюры и поиск, затем сброс кэша.
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    instance._old_group_id = None
+    if instance.pk is not None:
+        instance._old_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, **kwargs):
+    if created:
+        increment(UserStats, instance.author_id, 'posts_count')
+        shift_post_count(1)
+    old_group_id = instance._old_group_id
+    if old_group_id == instance.group_id:
+        return
+    if old_group_id is not None:
+        increment(Group, old_group_id, 'post_count', -1)
+    if instance.group_id is not None:
+        increment(Group, instance.group_id, 'post_count')
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    increment(UserStats, instance.author_id, 'posts_count', -1)
+    shift_post_count(-1)
+    if instance.group_id is not None:
+        increment(Group, instance.group_id, 'post_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        increment(Post, instance.post_id, 'comment_count')
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    increment(Post, instance.post_id, 'comment_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        increment(UserStats, instance.author_id, 'followers_count')
+        increment(UserStats, instance.user_id, 'following_count')
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    increment(UserStats, instance.author_id, 'followers_count', -1)
+    increment(UserStats, instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out([instance])
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance)
+    timeline.resume_fan_out(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def generate_thumbnails(sender, instance, **kwargs):
+    thumbnails.schedule_on_commit(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, created, **kwargs):
+    search.index_post(instance, created)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, **kwargs):
+    search.index_comment(instance, created)
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, **kwargs):
+    search.index_group(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.remove(SearchDocument.COMMENT, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feed(sender, **kwargs):
+    bump_feed_version()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    # Профиль и страница поста показывают счётчики и кнопку подписки
+    bump_version(version_key('follows', instance.user.username))
+    bump_version(version_key('follows', instance.author.username))
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_card(sender, instance, **kwargs):
+    bump_version(version_key('post', instance.pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, update_fields,
+                            **kwargs):
+    # Вход пользователя сохраняет только last_login — карточки не меняются.
+    # Имя автора есть и во фрагменте главной, поэтому сбрасывается и он.
+    if not created and (update_fields is None
+                        or 'username' in update_fields):
+        bump_version(version_key('user', instance.pk))
+        bump_feed_version()
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_cards(sender, instance, created, **kwargs):
+    if not created:
+        bump_version(version_key('group', instance.pk))
+
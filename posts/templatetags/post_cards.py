@@ -0,0 +1,11 @@
+from django import template
+
+from posts.cards import render_card
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    return render_card(post, context.get('user'),
+                       defer_edit=context.get('defer_edit', False))
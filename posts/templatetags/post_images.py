@@ -0,0 +1,10 @@
+from django import template
+
+from posts.thumbnails import card_picture as get_card_picture
+
+register = template.Library()
+
+
+@register.simple_tag
+def card_picture(image):
+    return get_card_picture(image)
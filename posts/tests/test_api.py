@@ -0,0 +1,104 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.counters import estimated_post_count
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='api_author', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='api_title', slug='api-slug', description='описание')
+        cls.posts = [
+            Post.objects.create(text=f'api post {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+            for i in range(5)
+        ]
+        cls.post = cls.posts[-1]
+        for i in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'api comment {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(f'api:{name}', args=args), params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response
+
+    def test_feed_is_paginated_by_cursor(self):
+        data = self.get('index', limit=3).json()
+        self.assertEqual([post['text'] for post in data['results']],
+                         ['api post 4', 'api post 3', 'api post 2'])
+        self.assertIsNone(data['previous'])
+        data = self.get('index', limit=3, cursor=data['next']).json()
+        self.assertEqual([post['text'] for post in data['results']],
+                         ['api post 1', 'api post 0'])
+        self.assertIsNone(data['next'])
+
+    def test_joined_author_and_group(self):
+        post = self.get('index').json()['results'][1]
+        self.assertEqual(post['author'], {
+            'username': 'api_author', 'first_name': 'Лев',
+            'last_name': 'Толстой'})
+        self.assertEqual(post['group'],
+                         {'slug': 'api-slug', 'title': 'api_title'})
+        self.assertIsNone(self.get('index').json()['results'][0]['group'])
+
+    def test_field_selection(self):
+        results = self.get(
+            'index', fields='id,author.username').json()['results']
+        self.assertEqual(results[0], {
+            'id': self.post.id, 'author': {'username': 'api_author'}})
+        response = self.get('index', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_page_is_one_query(self):
+        estimated_post_count()
+        with self.assertNumQueries(1):
+            self.get('index', fields='id')
+
+    def test_group_profile_and_post(self):
+        data = self.get('group_posts', self.group.slug).json()
+        self.assertEqual(data['group']['title'], 'api_title')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(len(data['results']), 2)
+
+        data = self.get('profile', self.author.username).json()
+        self.assertEqual(data['author']['posts_count'], 5)
+        self.assertFalse(data['author']['following'])
+
+        data = self.get('post', self.author.username, self.post.id).json()
+        self.assertEqual(data['text'], 'api post 4')
+        self.assertEqual(data['comment_count'], 3)
+
+    def test_comments(self):
+        data = self.get('comments', self.author.username, self.post.id,
+                        limit=2).json()
+        self.assertEqual([comment['text'] for comment in data['results']],
+                         ['api comment 0', 'api comment 1'])
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(
+            data['results'][0]['author']['username'], 'api_reader')
+
+    def test_follow_feed(self):
+        self.assertEqual(self.get('follow_index').status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        data = self.get('follow_index', fields='text').json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(data['results'][0], {'text': 'api post 4'})
+
+    def test_not_found_and_read_only(self):
+        response = self.get('post', 'nobody', self.post.id)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Не найдено'})
+        response = self.client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, 405)
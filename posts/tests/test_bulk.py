@@ -0,0 +1,134 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.counters import estimated_post_count
+from posts.models import (Comment, Follow, Group, Post, SearchDocument,
+                          TimelineEntry, User)
+
+
+class BulkApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='bulk_author')
+        cls.reader = User.objects.create_user(username='bulk_reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='bulk_title', slug='bulk-slug', description='')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def post(self, name, items):
+        return self.client.post(reverse(f'api:{name}'),
+                                json.dumps({'items': items}),
+                                content_type='application/json')
+
+    def test_posts_are_created_with_per_item_errors(self):
+        estimated_post_count()
+        items = [
+            {'text': 'пакет 1', 'group': self.group.pk},
+            {'text': ''},
+            {'text': 'пакет 2'},
+            {'text': 'пакет 3', 'group': 999},
+            'строка',
+        ]
+        response = self.post('bulk_posts', items)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual([error['index'] for error in data['errors']],
+                         [1, 3, 4])
+        self.assertIn('text', data['errors'][0]['errors'])
+        self.assertIn('group', data['errors'][1]['errors'])
+
+        posts = Post.objects.filter(pk__in=data['created']).order_by('pk')
+        self.assertEqual([post.text for post in posts],
+                         ['пакет 1', 'пакет 2'])
+        self.assertEqual(posts[0].group, self.group)
+        self.author.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertEqual(self.group.post_count, 1)
+        self.assertEqual(estimated_post_count(), 2)
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader, post__in=posts).count(), 2)
+        self.assertEqual(SearchDocument.objects.filter(
+            kind=SearchDocument.POST, post__in=posts).count(), 2)
+
+    def count_queries(self, size):
+        items = [{'text': f'текст {i}', 'group': self.group.pk}
+                 for i in range(size)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post('bulk_posts', items)
+        self.assertEqual(response.status_code, 201)
+        return len(queries)
+
+    def test_batch_cost_does_not_grow_with_size(self):
+        self.assertEqual(self.count_queries(20), self.count_queries(2))
+
+    def test_comments(self):
+        post = Post.objects.create(text='пост', author=self.reader)
+        response = self.post('bulk_comments', [
+            {'post': post.pk, 'text': 'первый'},
+            {'post': post.pk, 'text': 'второй'},
+            {'post': 999, 'text': 'мимо'},
+            {'post': post.pk},
+        ])
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(len(data['created']), 2)
+        self.assertEqual(
+            data['errors'][0],
+            {'index': 2, 'errors': {'post': [
+                {'message': 'Пост не найден.', 'code': 'invalid_choice'}]}})
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(
+            list(Comment.objects.filter(pk__in=data['created'])
+                 .order_by('pk').values_list('text', flat=True)),
+            ['первый', 'второй'])
+
+    def test_rejected_requests(self):
+        self.assertEqual(self.post('bulk_posts', [{'text': ''}]).status_code,
+                         400)
+        response = self.client.post(reverse('api:bulk_posts'), 'не json',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('api:bulk_posts')).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.post('bulk_posts', []).status_code, 401)
+
+    def test_basic_auth_without_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        bot = User.objects.create_user(username='bulk_bot', password='secret')
+        body = json.dumps({'items': [{'text': 'бот'}]})
+
+        def post(credentials):
+            token = base64.b64encode(credentials.encode()).decode()
+            return client.post(reverse('api:bulk_posts'), body,
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=f'Basic {token}')
+
+        response = post('bulk_bot:secret')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.get(pk=response.json()['created'][0])
+                         .author, bot)
+        response = post('bulk_bot:wrong')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Basic', response['WWW-Authenticate'])
+
+    def test_session_requires_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = client.post(reverse('api:bulk_posts'),
+                               json.dumps({'items': [{'text': 'сессия'}]}),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.filter(text='сессия').exists())
@@ -0,0 +1,64 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from yatube.cache import LOG_KEY, TwoTierCache
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    """Два экземпляра с разными LOCATION ведут себя как два процесса
+    с общим кэшем shared."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.first = self.process('first', SYNC_INTERVAL=0)
+        self.second = self.process('second', SYNC_INTERVAL=0)
+
+    def process(self, name, **options):
+        backend = TwoTierCache(f'test-{self.id()}-{name}',
+                               {'OPTIONS': dict(SHARED='shared', **options)})
+        self.addCleanup(backend._drop_all)
+        return backend
+
+    def test_reads_are_served_locally(self):
+        self.first.set('key', 'value')
+        caches['shared'].delete('key')
+        self.assertEqual(self.first.get('key'), 'value')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_changes_are_broadcast(self):
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+        self.first.set('key', 2)
+        self.assertEqual(self.second.get('key'), 2)
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.second.set('counter', 1)
+        self.assertEqual(self.first.get('counter'), 1)
+        self.second.incr('counter')
+        self.assertEqual(self.first.get('counter'), 2)
+
+    def test_stale_within_sync_interval(self):
+        lazy = self.process('lazy', SYNC_INTERVAL=3600)
+        self.first.set('key', 1)
+        self.assertEqual(lazy.get('key'), 1)
+        self.first.set('key', 2)
+        self.assertEqual(lazy.get('key'), 1)
+
+    def test_lost_log_drops_everything(self):
+        self.first.set('key', 1)
+        self.first.set('other', 1)
+        self.assertEqual(self.second.get('key'), 1)
+        self.assertEqual(self.second.get('other'), 1)
+        self.first.set('key', 2)
+        caches['shared'].set('other', 2)
+        caches['shared'].delete(LOG_KEY.format(
+            caches['shared'].get('two_tier:epoch')))
+        self.assertEqual(self.second.get('other'), 2)
+
+    def test_lru_eviction(self):
+        small = self.process('small', LOCAL_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            small.set(key, key)
+        self.assertEqual(len(small._state.entries), 2)
+        self.assertNotIn(caches['shared'].make_key('a'),
+                         small._state.entries)
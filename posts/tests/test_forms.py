@@ -3,13 +3,15 @@ import tempfile
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.forms import NewForm
 from posts.models import Group, Post, User
+from users.forms import CreationForm
 
 
+@override_settings(THUMBNAIL_WORKERS=0)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -93,3 +95,18 @@ class PostCreateFormTests(TestCase):
         )
         post = Post.objects.filter(text='Изображение').first()
         self.assertIsNotNone(post.image.url)
+
+
+class SignUpFormTests(TestCase):
+    def form(self, username):
+        return CreationForm({'username': username,
+                             'password1': 'Qwerty-12345',
+                             'password2': 'Qwerty-12345'})
+
+    def test_route_names_are_reserved(self):
+        for username in ('search', 'feed', 'nav', 'new', 'group'):
+            with self.subTest(username=username):
+                self.assertIn('username', self.form(username).errors)
+
+    def test_regular_username(self):
+        self.assertTrue(self.form('searcher').is_valid())
@@ -1,7 +1,15 @@
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-from posts.models import Group, Post
+from posts.counters import estimated_post_count
+from posts.models import Comment, Follow, Group, Post, UserStats
 
 
 class PostModelTest(TestCase):
@@ -89,3 +97,118 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         post_object_name = group.title
         self.assertEqual(post_object_name, str(group))
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.author = User.objects.create(username='counter_author')
+        self.reader = User.objects.create(username='counter_reader')
+        self.group = Group.objects.create(
+            title='группа', slug='counters', description='описание')
+        self.other_group = Group.objects.create(
+            title='группа 2', slug='counters-2', description='описание')
+
+    def refresh(self):
+        for obj in (self.author.stats, self.reader.stats,
+                    self.group, self.other_group):
+            obj.refresh_from_db()
+
+    def test_post_and_group_counters(self):
+        post = Post.objects.create(
+            text='текст', author=self.author, group=self.group)
+        self.refresh()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.group.post_count, 1)
+
+        post.group = self.other_group
+        post.save()
+        self.refresh()
+        self.assertEqual(self.group.post_count, 0)
+        self.assertEqual(self.other_group.post_count, 1)
+
+        post.delete()
+        self.refresh()
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.other_group.post_count, 0)
+
+    def test_edit_moves_group_counter_atomically(self):
+        post = Post.objects.create(
+            text='текст', author=self.author, group=self.group)
+        self.client.force_login(self.author)
+        url = reverse('post_edit', args=[self.author.username, post.id])
+        with mock.patch('posts.signals.increment',
+                        side_effect=[None, DatabaseError]):
+            with self.assertRaises(DatabaseError):
+                self.client.post(url, {'text': 'текст',
+                                       'group': self.other_group.pk})
+        post.refresh_from_db()
+        self.refresh()
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(self.group.post_count, 1)
+        self.assertEqual(self.other_group.post_count, 0)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(text='текст', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.refresh()
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        follow.delete()
+        self.refresh()
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertEqual(self.reader.stats.following_count, 0)
+
+    def test_estimated_post_count(self):
+        posts = [Post.objects.create(text=str(i), author=self.author)
+                 for i in range(3)]
+        posts[0].delete()
+        cache.clear()
+        # Без кэша — сумма счётчиков авторов, COUNT(*) по постам нет.
+        with self.assertNumQueries(1):
+            self.assertEqual(estimated_post_count(), 2)
+        Post.objects.create(text='ещё', author=self.author)
+        self.assertEqual(estimated_post_count(), 3)
+
+        UserStats.objects.update(posts_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(estimated_post_count(), 3)
+        posts[1].delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(estimated_post_count(), 2)
+
+    @override_settings(POST_COUNT_TIMEOUT=60)
+    def test_estimated_post_count_expires(self):
+        cache.clear()
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            estimated_post_count()
+        add.assert_called_once_with(mock.ANY, mock.ANY, 60)
+
+    def test_reconcile_counters_command(self):
+        post = Post.objects.create(
+            text='текст', author=self.author, group=self.group)
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(posts_count=7, followers_count=0)
+        Post.objects.update(comment_count=3)
+        UserStats.objects.filter(user=self.reader).delete()
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+
+        self.refresh()
+        post.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(UserStats.objects.get(
+            user=self.reader).following_count, 1)
+        self.assertEqual(post.comment_count, 0)
+        self.assertIn('Post.comment_count: исправлено 1', out.getvalue())
@@ -0,0 +1,97 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, SearchDocument, User
+from posts.seeding import seed
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class PerformanceBudgetTest(TestCase):
+    """Потолки числа запросов и времени ответа на реалистичных данных.
+
+    Число запросов не должно зависеть от объёма данных: рост потолка
+    означает N+1. Время — грубая граница против деградаций на порядок.
+    """
+
+    # url name: (запросов не больше, миллисекунд не больше). Окно страниц
+    # добавляет до двух запросов ключей — вперёд и назад от страницы.
+    # Главная при пустом кэше берёт число постов одним запросом
+    # Sum(UserStats.posts_count) вместо чтения группы, поэтому её потолок
+    # тот же, что у group_posts; дальше сумма берётся из кэша.
+    budgets = {
+        'index': (6, 300),
+        'group_posts': (6, 300),
+        'profile': (7, 300),
+        'post': (6, 300),
+        'follow_index': (7, 300),
+        'add_comment': (14, 300),
+        'new_post': (18, 300),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        seed()
+        cls.reader = (
+            User.objects.filter(stats__following_count__gt=0)
+            .order_by('-stats__following_count').first()
+        )
+        cls.author = (
+            User.objects.order_by('-stats__posts_count').first()
+        )
+        cls.post = Post.objects.order_by('-comment_count').first()
+        cls.group = Group.objects.order_by('-post_count').first()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def measure(self, name, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data)
+            elapsed = (time.perf_counter() - started) * 1000
+        max_queries, max_ms = self.budgets[name]
+        with self.subTest(view=name):
+            self.assertLess(response.status_code, 400)
+            self.assertLessEqual(
+                len(queries), max_queries,
+                '\n'.join(q['sql'] for q in queries))
+            self.assertLessEqual(elapsed, max_ms)
+        return response
+
+    def test_read_views(self):
+        post = self.post
+        urls = {
+            'index': reverse('index'),
+            'group_posts': reverse('group_posts', args=[self.group.slug]),
+            'profile': reverse('profile', args=[self.author.username]),
+            'post': reverse('post', args=[post.author.username, post.id]),
+            'follow_index': reverse('follow_index'),
+        }
+        for name, url in urls.items():
+            response = self.measure(name, 'get', url)
+            page = response.context.get('page')
+            if page is not None and page.has_next():
+                cache.clear()
+                self.measure(name, 'get', url, {'cursor': page.next_cursor})
+
+    def test_write_views(self):
+        post = self.post
+        self.measure(
+            'add_comment', 'post',
+            reverse('add_comment', args=[post.author.username, post.id]),
+            {'text': 'new comment'})
+        self.measure('new_post', 'post', reverse('new_post'),
+                     {'text': 'new post', 'group': self.group.id})
+
+    def test_seed_indexes_comments(self):
+        self.assertEqual(
+            SearchDocument.objects.filter(
+                kind=SearchDocument.COMMENT).count(),
+            Comment.objects.count())
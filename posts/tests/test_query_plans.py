@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='plan_author')
+        cls.reader = User.objects.create_user(username='plan_reader')
+        cls.group = Group.objects.create(
+            title='plan', slug='plan', description='plan')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(25):
+            post = Post.objects.create(
+                text=f'post {i}', author=cls.author, group=cls.group)
+            Comment.objects.create(post=post, author=cls.reader, text='c')
+        cls.post = post
+        # Больше страницы комментариев, чтобы проверить и курсор
+        Comment.objects.bulk_create(
+            Comment(post=post, author=cls.reader, text=f'c {i}')
+            for i in range(25))
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def ordered_queries(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        sql = [q['sql'] for q in queries if 'ORDER BY' in q['sql']]
+        self.assertTrue(sql, f'{url}: нет запросов с ORDER BY')
+        return response, sql
+
+    def assert_uses_indexes(self, url):
+        response, queries = self.ordered_queries(url)
+        page = response.context.get('page')
+        if page is not None and page.has_next():
+            _, more = self.ordered_queries(url, {'cursor': page.next_cursor})
+            queries += more
+        for sql in queries:
+            plan = self.explain(sql)
+            with self.subTest(url=url, sql=sql):
+                self.assertFalse(
+                    [step for step in plan if 'TEMP B-TREE' in step], plan)
+                self.assertFalse(
+                    [step for step in plan if step.startswith('SCAN ')
+                     and 'INDEX' not in step], plan)
+
+    def test_feeds_use_indexes(self):
+        """Основные запросы лент идут по индексу без сортировки"""
+        urls = [
+            reverse('index'),
+            reverse('group_posts', args=[self.group.slug]),
+            reverse('profile', args=[self.author]),
+            reverse('follow_index'),
+        ]
+        for url in urls:
+            self.assert_uses_indexes(url)
+
+    def test_post_comments_use_index(self):
+        """Комментарии страницы поста листаются по comment_post_created_id"""
+        url = reverse('post', args=[self.author, self.post.id])
+        self.assert_uses_indexes(url)
+        _, queries = self.ordered_queries(url)
+        plans = [self.explain(sql) for sql in queries
+                 if 'posts_comment' in sql]
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertTrue(
+                [step for step in plan if 'comment_post_created_id' in step],
+                plan)
+
+    def test_follower_lookup_uses_index(self):
+        """Подписчики автора для раскладки ищутся по follow_author_user"""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(timeline._followers(self.author.pk),
+                             [self.reader.pk])
+        sql = [q['sql'] for q in queries if 'posts_follow' in q['sql']]
+        self.assertEqual(len(sql), 1)
+        plan = self.explain(sql[0])
+        self.assertTrue(
+            [step for step in plan if 'COVERING INDEX follow_author_user'
+             in step], plan)
@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube import metrics, querylog
+
+
+class TimingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='timer')
+        Post.objects.create(text='Текст', author=user)
+
+    def setUp(self):
+        # Из кэша фрагмента лента отдаётся без запросов
+        cache.clear()
+
+    @override_settings(TIMING_SAMPLE_RATE=1.0)
+    def test_server_timing_header(self):
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            response = self.client.get(reverse('index'))
+        metrics = {
+            part.split(';')[0]: part
+            for part in response['Server-Timing'].split(', ')
+        }
+        self.assertEqual(set(metrics), {'sql', 'tpl', 'thumb', 'total'})
+        self.assertRegex(metrics['sql'], r'desc="[1-9]\d* queries"')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['template_ms'])
+
+    @override_settings(TIMING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_literals_and_lists_are_normalized(self):
+        first = querylog.fingerprint(
+            'SELECT * FROM "posts_post" WHERE "id" IN (%s, %s, %s) '
+            "AND text = 'a' LIMIT 21")
+        second = querylog.fingerprint(
+            'SELECT *  FROM "posts_post"\nWHERE "id" IN (%s) '
+            "AND text = 'it''s' LIMIT 11")
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first, 'SELECT * FROM "posts_post" WHERE "id" IN (...) '
+                   'AND text = ? LIMIT ?')
+
+
+@override_settings(QUERY_LOG_ENABLED=True, QUERY_LOG_DUMP_INTERVAL=3600)
+class QueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='logged')
+        Post.objects.create(text='Текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        querylog.stats.reset()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_queries_grouped_by_view(self):
+        for _ in range(2):
+            self.client.get(reverse('profile', args=[self.user.username]))
+        views = querylog.stats.top(limit=20)
+        self.assertEqual(views['profile']['requests'], 2)
+        queries = views['profile']['queries']
+        self.assertTrue(queries)
+        self.assertTrue(all(query['per_request'] == 1 for query in queries))
+
+    def test_dump(self):
+        self.client.get(reverse('index'))
+        path = querylog.dump(os.path.join(self.directory, 'q-{pid}.json'))
+        self.assertEqual(os.path.basename(path), f'q-{os.getpid()}.json')
+        with open(path) as report:
+            self.assertIn('index', json.load(report)['views'])
+
+    @override_settings(QUERY_LOG_SLOW_MS=0)
+    def test_slow_queries_are_logged(self):
+        with self.assertLogs('yatube.querylog', 'WARNING') as logs:
+            self.client.get(reverse('index'))
+        self.assertIn('index', logs.output[0])
+
+
+@override_settings(METRICS_DIR=None)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='measured')
+        Post.objects.create(text='Текст', author=user)
+
+    def setUp(self):
+        for metric in metrics.REGISTRY:
+            metric.values.clear()
+        cache.clear()
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_and_cache(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        text = self.scrape()
+        self.assertIn('yatube_requests_total{view="index",method="GET",'
+                      'status="200"} 2', text)
+        self.assertIn('yatube_request_duration_seconds_count'
+                      '{view="index"} 2', text)
+        self.assertIn('yatube_cache_requests_total{cache="default",'
+                      'kind="fragment",result="miss"} 1', text)
+        self.assertIn('yatube_cache_requests_total{cache="default",'
+                      'kind="fragment",result="hit"} 1', text)
+        self.assertRegex(text, r'yatube_db_queries_total\{view="index"\} '
+                               r'[1-9]')
+
+    def test_other_processes_are_summed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other = {'yatube_requests_total': [[['index', 'GET', '200'], 5]]}
+        with open(os.path.join(directory, '1.json'), 'w') as output:
+            json.dump(other, output)
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('index'))
+            text = self.scrape()
+        self.assertIn('yatube_requests_total{view="index",method="GET",'
+                      'status="200"} 6', text)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+    def test_access_is_restricted(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 200)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_caches_are_labelled_by_alias(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(CACHES={'files': {
+                'BACKEND': 'yatube.metrics.FileBasedCache',
+                'LOCATION': directory}}):
+            backend = metrics.FileBasedCache(directory, {})
+        backend.get('key')
+        text = self.scrape()
+        self.assertIn('yatube_cache_requests_total{cache="files",'
+                      'kind="object",result="miss"} 1', text)
+        self.assertNotIn(directory, text)
@@ -1,16 +1,22 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts.counters import reconcile
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.paginators import LAST, CursorPaginator
 
 
+@override_settings(THUMBNAIL_WORKERS=0)
 class ViewPageContextTest(TestCase):
 
     @classmethod
@@ -147,6 +153,16 @@ class ViewPageContextTest(TestCase):
             with self.subTest(key=key):
                 self.assertEqual(response.context[key], val)
 
+    def test_profile_without_stats_row(self):
+        """Профиль пользователя без строки UserStats показывает нули"""
+        User.objects.bulk_create([User(username='no_stats')])
+        for name in ('profile', 'api:profile'):
+            with self.subTest(name=name):
+                response = self.guest_client.get(
+                    reverse(name, args=['no_stats']))
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['author']['followers_count'], 0)
+
     def test_post_view_context(self):
         url = reverse('post', args=[self.user_1, self.test_post.id])
         response = self.user_1_client.get(url)
@@ -178,6 +194,25 @@ class ViewPageContextTest(TestCase):
         image = response.context.get('post').image
         self.assertEqual(image, self.test_post.image)
 
+    def test_thumbnail_placeholder_until_generated(self):
+        """Пока миниатюры нет, карточка показывает заглушку"""
+        cache.clear()
+        url = reverse('profile', args=[self.user_1])
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            content = self.guest_client.get(url).content.decode()
+        schedule.assert_called_once_with(self.test_post.image.name)
+        self.assertNotIn('<img class="card-img"', content)
+
+        content = self.guest_client.get(url).content.decode()
+        self.assertNotIn('<img class="card-img"', content)
+        content = self.guest_client.get(url).content.decode()
+        self.assertIn('<img class="card-img"', content)
+        self.assertIn('type="image/webp"', content)
+        for width in (320, 640, 960, 1920):
+            with self.subTest(width=width):
+                self.assertIn(f'.webp {width}w', content)
+                self.assertIn(f'.jpg {width}w', content)
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -275,13 +310,665 @@ class FollowTest(TestCase):
 
     def test_cache(self):
         response1 = self.auth_client.get(reverse('index'))
-        post = Post.objects.create(author=self.author, text='test')
+        post = Post.objects.create(author=self.author, text='test-cached')
         response2 = self.auth_client.get(reverse('index'))
-        Post.objects.filter(id=post.id).delete()
+        self.assertIn(post.text, response2.content.decode())
 
+        Post.objects.filter(id=post.id).update(text='test-changed')
         response3 = self.auth_client.get(reverse('index'))
         self.assertEqual(response2.content, response3.content)
 
-        cache.clear()
+        post.delete()
         response4 = self.auth_client.get(reverse('index'))
         self.assertEqual(response1.content, response4.content)
+
+    def test_cache_is_page_aware(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'page-post-{i}') for i in range(12))
+        response1 = self.guest.get(reverse('index'))
+        cursor = response1.context['page'].next_cursor
+        response2 = self.guest.get(reverse('index'), {'cursor': cursor})
+        self.assertNotIn('page-post-11', response2.content.decode())
+        self.assertIn('page-post-11', response1.content.decode())
+
+    def test_cache_keeps_edit_button_for_owner(self):
+        edit_url = f'/{self.author}/{self.post.id}/edit'
+        self.guest.get(reverse('index'))
+        response = self.auth_client.get(reverse('index'))
+        self.assertIn(edit_url, response.content.decode())
+        response = self.auth_client2.get(reverse('index'))
+        self.assertNotIn(edit_url, response.content.decode())
+
+    def test_cache_ignores_junk_cursors(self):
+        self.guest.get(reverse('index'))
+        for cursor in ('junk', 'more-junk'):
+            with self.subTest(cursor=cursor):
+                with self.assertNumQueries(0):
+                    self.guest.get(reverse('index'), {'cursor': cursor})
+
+    def test_cache_follows_username_change(self):
+        author = User.objects.create(username='old_name')
+        Post.objects.create(author=author, text='renamed-post')
+        self.guest.get(reverse('index'))
+        author.username = 'new_name'
+        author.save()
+        content = self.guest.get(reverse('index')).content.decode()
+        self.assertIn('new_name', content)
+        self.assertNotIn('old_name', content)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+        cls.group = Group.objects.create(
+            title='feed_title',
+            slug='feed-slug',
+            description='feed-description'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = [
+            reverse('index'),
+            reverse('group_posts', args=[self.group.slug]),
+            reverse('profile', args=[self.author]),
+            reverse('follow_index'),
+        ]
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'post {i}', author=self.author, group=self.group)
+            Comment.objects.create(post=post, author=self.reader, text='c')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт с числом постов на странице"""
+        self.create_posts(1)
+        single = {url: self.count_queries(url) for url in self.urls}
+        self.create_posts(9)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+    def test_pages_do_not_count(self):
+        """Профиль и ленты берут счётчики из полей, а не COUNT(*)"""
+        self.create_posts(3)
+        for url in self.urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                self.assertFalse(
+                    [q for q in queries if 'COUNT(' in q['sql'].upper()])
+
+    def test_cached_index_does_not_load_page(self):
+        """Попадание в кэш фрагмента главной обходится без запросов"""
+        self.create_posts(3)
+        cache.clear()
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            response = Client().get(reverse('index'))
+        self.assertIn('post 2', response.content.decode())
+
+    def test_feed_comment_count(self):
+        self.create_posts(1)
+        Comment.objects.create(
+            post=Post.objects.get(), author=self.author, text='c')
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['page'][0].comment_count, 2)
+
+
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cursor_author')
+        Post.objects.bulk_create(
+            Post(text=f'post {i}', author=cls.author) for i in range(25))
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_walk_pages_forward_and_back(self):
+        """Курсоры ведут по всем постам вперёд и назад без повторов"""
+        seen = []
+        pages = []
+        cursor = ''
+        while True:
+            response = self.client.get(reverse('index'), {'cursor': cursor})
+            page = response.context['page']
+            pages.append([post.id for post in page])
+            seen.extend(pages[-1])
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual([len(ids) for ids in pages], [10, 10, 5])
+        self.assertEqual(seen, list(Post.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True)))
+
+        response = self.client.get(
+            reverse('index'), {'cursor': page.previous_cursor})
+        self.assertEqual([post.id for post in response.context['page']],
+                         pages[1])
+
+    def test_cursor_page_does_not_count(self):
+        first = self.client.get(reverse('index')).context['page']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('index'), {'cursor': first.next_cursor})
+        self.assertFalse(
+            [q for q in queries if 'COUNT(*)' in q['sql'].upper()])
+
+    def test_estimated_count(self):
+        reconcile()
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['paginator'].count, 25)
+        self.assertContains(response, 'Записей: около 25')
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('index'), {'cursor': 'broken'})
+        page = response.context['page']
+        self.assertFalse(page.has_previous())
+        self.assertEqual(len(page), 10)
+
+
+class PageWindowTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='window_author')
+        Post.objects.bulk_create(
+            Post(text=f'post {i}', author=author) for i in range(25))
+
+    def setUp(self):
+        # 13 страниц по 2 поста, по две соседние с каждой стороны.
+        self.paginator = CursorPaginator(Post.objects.all(), 2)
+
+    def labels(self, page):
+        return [link and ('*' if link.current else '') + link.label
+                for link in page.window]
+
+    def follow(self, page, label):
+        link, = [link for link in page.window
+                 if link and link.label == label]
+        return self.paginator.get_page(link.cursor)
+
+    def test_window_moves_with_page(self):
+        page = self.paginator.get_page(None)
+        self.assertEqual(self.labels(page),
+                         ['*1', '2', '3', None, 'Последняя'])
+        page = self.follow(page, '3')
+        self.assertEqual(self.labels(page),
+                         ['1', '2', '*3', '4', '5', None, 'Последняя'])
+        page = self.follow(self.follow(page, '5'), '7')
+        self.assertEqual(
+            self.labels(page),
+            ['1', None, '5', '6', '*7', '8', '9', None, 'Последняя'])
+        self.assertEqual(
+            [post.text for post in page], ['post 12', 'post 11'])
+
+    def test_last_page_counts_from_the_end(self):
+        page = self.paginator.get_page(LAST)
+        self.assertEqual([post.text for post in page], ['post 1', 'post 0'])
+        self.assertFalse(page.has_next())
+        self.assertEqual(
+            self.labels(page),
+            ['1', None, '3-я с конца', '2-я с конца', '*Последняя'])
+        page = self.follow(page, '3-я с конца')
+        self.assertEqual([post.text for post in page], ['post 5', 'post 4'])
+
+    def test_number_is_fixed_near_the_start(self):
+        page = self.paginator.get_page(LAST)
+        while page.has_previous():
+            page = self.paginator.get_page(page.previous_cursor)
+        self.assertEqual(self.labels(page)[0], '*1')
+
+    def test_window_cost_does_not_depend_on_position(self):
+        page = self.follow(self.paginator.get_page(None), '3')
+        with CaptureQueriesContext(connection) as queries:
+            page.window
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertIn('LIMIT 5', query['sql'])
+
+
+class FeedFragmentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='fragment_author')
+        cls.group = Group.objects.create(
+            title='fragment_title', slug='fragment-slug', description='')
+        for i in range(15):
+            Post.objects.create(text=f'fragment post {i}', author=cls.author,
+                                group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def collect(self, url):
+        texts, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('<html', data['html'])
+            texts.append(data['html'].count('fragment post'))
+            cursor = data['next']
+        return texts
+
+    def test_batches_follow_cursor(self):
+        urls = [
+            reverse('index_feed'),
+            reverse('group_feed', args=[self.group.slug]),
+            reverse('profile_feed', args=[self.author.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.collect(url), [10, 5])
+
+    def test_follow_feed(self):
+        reader = User.objects.create_user(username='fragment_reader')
+        Follow.objects.create(user=reader, author=self.author)
+        url = reverse('follow_feed')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(reader)
+        self.assertEqual(self.collect(url), [10, 5])
+
+    def test_feed_pages_link_fragments(self):
+        response = self.client.get(
+            reverse('group_posts', args=[self.group.slug]))
+        self.assertContains(
+            response, 'data-url="%s"' % reverse(
+                'group_feed', args=[self.group.slug]))
+        self.assertContains(response, response.context['page'].next_cursor)
+
+    def test_missing_group(self):
+        url = reverse('group_feed', args=['missing'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='timeline_reader')
+        cls.author = User.objects.create_user(username='timeline_author')
+        cls.star = User.objects.create_user(username='timeline_star')
+        cls.old_post = Post.objects.create(text='old', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_ids(self, cursor=''):
+        response = self.client.get(reverse('follow_index'),
+                                   {'cursor': cursor})
+        return [post.id for post in response.context['page']]
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        self.client.get(reverse('profile_follow', args=[self.author]))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+
+        self.client.get(reverse('profile_unfollow', args=[self.author]))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='new', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed_ids(), [post.id, self.old_post.id])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_pulled_author_is_merged_on_read(self):
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        star_posts = [Post.objects.create(text=f'star {i}', author=self.star)
+                      for i in range(12)]
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.star).exists())
+
+        TimelineEntry.objects.create(user=self.reader, post=self.old_post,
+                                     pub_date=self.old_post.pub_date)
+        response = self.client.get(reverse('follow_index'))
+        page = response.context['page']
+        expected = [post.id for post in reversed(star_posts)]
+        self.assertEqual([post.id for post in page], expected[:10])
+        self.assertEqual(self.feed_ids(page.next_cursor),
+                         expected[10:] + [self.old_post.id])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_dropping_to_limit_is_backfilled(self):
+        """Посты, вышедшие, пока автор был выше порога, не пропадают из
+        ленты, когда он к порогу возвращается"""
+        others = [User.objects.create_user(username=f'timeline_fan_{i}')
+                  for i in range(2)]
+        for user in others:
+            Follow.objects.create(user=user, author=self.star)
+        post = Post.objects.create(text='star', author=self.star)
+        Follow.objects.create(user=self.reader, author=self.star)
+        self.assertEqual(self.feed_ids(), [post.id])
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        for user in others:
+            Follow.objects.filter(user=user, author=self.star).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, TIMELINE_RESUME_MAX_ROWS=5)
+    def test_resumed_fan_out_is_capped(self):
+        """Раскладка после возврата к порогу не вставляет больше
+        TIMELINE_RESUME_MAX_ROWS строк"""
+        fans = [User.objects.create_user(username=f'timeline_cap_{i}')
+                for i in range(3)]
+        for user in fans:
+            Follow.objects.create(user=user, author=self.star)
+        posts = [Post.objects.create(text=f'cap {i}', author=self.star)
+                 for i in range(5)]
+        Follow.objects.filter(user=fans[0], author=self.star).delete()
+        entries = TimelineEntry.objects.filter(post__author=self.star)
+        # Двум подписчикам — по два последних поста
+        self.assertEqual(entries.count(), 4)
+        self.assertEqual(set(entries.values_list('post_id', flat=True)),
+                         {posts[-1].id, posts[-2].id})
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='search_author')
+        cls.group = Group.objects.create(
+            title='Коты', slug='cats', description='Всё про кошки и котов')
+        cls.post = Post.objects.create(
+            text='Кошки спят <b>весь</b> день', author=cls.author)
+        cls.other_post = Post.objects.create(
+            text='Собаки гуляют', author=cls.author)
+        Comment.objects.create(
+            post=cls.other_post, author=cls.author, text='Кошки тоже гуляют')
+
+    def search(self, query, page=1):
+        response = Client().get(reverse('search'), {'q': query, 'page': page})
+        return response.context['hits'], response
+
+    def test_finds_posts_comments_and_groups(self):
+        hits, _ = self.search('кошки')
+        found = {(hit.kind, hit.post, hit.group) for hit in hits}
+        self.assertEqual(found, {
+            ('post', self.post, None),
+            ('comment', self.other_post, None),
+            ('group', None, self.group),
+        })
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        Comment.objects.create(
+            post=self.post, author=self.author, text='<i>Тихо</i>, спят')
+        _, response = self.search('тихо')
+        content = response.content.decode()
+        self.assertIn('&lt;i&gt;<mark>Тихо</mark>&lt;/i&gt;', content)
+        self.assertNotIn('<i>Тихо</i>', content)
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(text='Хомяки', author=self.author)
+        self.assertEqual(len(self.search('хомяки')[0]), 1)
+        post.text = 'Морские свинки'
+        post.save()
+        self.assertEqual(self.search('хомяки')[0], [])
+        self.assertEqual(len(self.search('свинки')[0]), 1)
+        post.delete()
+        self.assertEqual(self.search('свинки')[0], [])
+
+    def test_new_comment_is_indexed_without_reading(self):
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.create(
+                post=self.post, author=self.author, text='Кошки мурчат')
+        documents = [query['sql'] for query in queries.captured_queries
+                     if 'posts_searchdocument' in query['sql']]
+        self.assertEqual(len(documents), 1)
+        self.assertTrue(documents[0].startswith('INSERT'))
+
+    def test_pagination(self):
+        Post.objects.bulk_create(
+            Post(text=f'ежи {i}', author=self.author) for i in range(12))
+        for post in Post.objects.filter(text__startswith='ежи'):
+            post.save()
+        hits, response = self.search('ежи')
+        self.assertEqual(len(hits), 10)
+        self.assertTrue(response.context['has_next'])
+        hits, response = self.search('ежи', page=2)
+        self.assertEqual(len(hits), 2)
+        self.assertFalse(response.context['has_next'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        hits, response = self.search('"кошки) *')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(hits), 3)
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class CardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='card_author')
+        self.reader = User.objects.create_user(username='card_reader')
+        self.group = Group.objects.create(
+            title='card_title', slug='card-slug', description='')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='card-text')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.url = reverse('group_posts', args=[self.group.slug])
+
+    def page(self, client=None):
+        return (client or self.client).get(self.url).content.decode()
+
+    def test_card_is_served_from_cache(self):
+        self.page()
+        Post.objects.filter(pk=self.post.pk).update(text='card-updated')
+        self.assertIn('card-text', self.page())
+
+        self.post.text = 'card-saved'
+        self.post.save()
+        self.assertIn('card-saved', self.page())
+
+    def test_dependencies_invalidate_card(self):
+        self.page()
+        self.author.username = 'card_renamed'
+        self.author.save()
+        self.group.title = 'card_new_title'
+        self.group.save()
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='comment')
+        content = self.page()
+        self.assertIn('@card_renamed', content)
+        self.assertIn('#card_new_title', content)
+        self.assertIn('Комментариев: 1', content)
+
+    def test_login_keeps_cards(self):
+        self.page()
+        Post.objects.filter(pk=self.post.pk).update(text='card-updated')
+        self.client.force_login(self.author)
+        self.assertIn('card-text', self.page())
+
+    def test_edit_button_is_viewer_specific(self):
+        edit_url = f'/{self.author.username}/{self.post.id}/edit'
+        self.assertNotIn(edit_url, self.page())
+        self.assertIn(edit_url, self.page(self.author_client))
+        self.assertNotIn(edit_url, self.page())
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='etag_author')
+        self.reader = User.objects.create_user(username='etag_reader')
+        self.group = Group.objects.create(
+            title='etag_title', slug='etag-slug', description='')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='etag-text')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = [
+            reverse('index'),
+            reverse('group_posts', args=[self.group.slug]),
+            reverse('profile', args=[self.author.username]),
+            reverse('post', args=[self.author.username, self.post.id]),
+        ]
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified_until_data_changes(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 304)
+                Comment.objects.create(post=self.post, author=self.reader,
+                                       text='new')
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(self.revalidate(
+                    url, response, self.reader_client).status_code, 200)
+
+    def test_new_csrf_token_changes_post_page(self):
+        """После повторного входа форма комментария получает новый токен"""
+        url = reverse('post', args=[self.author.username, self.post.id])
+        self.reader_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = self.reader_client.get(url)
+        self.assertEqual(self.revalidate(
+            url, response, self.reader_client).status_code, 304)
+        self.reader_client.cookies[settings.CSRF_COOKIE_NAME] = 'b' * 64
+        self.assertEqual(self.revalidate(
+            url, response, self.reader_client).status_code, 200)
+
+    def test_follow_changes_author_pages(self):
+        url = reverse('profile', args=[self.author.username])
+        response = self.reader_client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.revalidate(
+            url, response, self.reader_client).status_code, 200)
+
+    def test_last_modified(self):
+        url = reverse('index')
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        ).status_code, 304)
+
+
+class AnonymousFastPathTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='fast_author')
+        cls.group = Group.objects.create(
+            title='fast_title', slug='fast-slug', description='')
+        Post.objects.create(author=cls.author, group=cls.group, text='fast')
+        cls.urls = [
+            reverse('index'),
+            reverse('group_posts', args=[cls.group.slug]),
+            reverse('profile', args=[cls.author.username]),
+        ]
+
+    def test_anonymous_pages_are_public(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('max-age=', response['Cache-Control'])
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+                self.assertFalse(response.cookies)
+                self.assertContains(response, reverse('nav'))
+
+    def test_session_cookie_takes_full_path(self):
+        self.client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn('public',
+                                 response.get('Cache-Control', ''))
+                self.assertIn('Cookie', response['Vary'])
+                self.assertContains(response, 'Пользователь: fast_author')
+
+    @override_settings(ANONYMOUS_FAST_PATH=False)
+    def test_can_be_disabled(self):
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+        self.assertNotContains(response, reverse('nav'))
+
+    def test_nav_endpoint(self):
+        response = self.client.get(reverse('nav'))
+        self.assertContains(response, reverse('login'))
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('nav'))
+        self.assertContains(response, 'Пользователь: fast_author')
+        self.assertIn('no-cache', response['Cache-Control'])
+
+
+class PostViewQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='single_author')
+        cls.group = Group.objects.create(
+            title='single_title', slug='single-slug', description='')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='single')
+        cls.url = reverse('post', args=[cls.author.username, cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+
+    def add_comments(self, count):
+        start = Comment.objects.count()
+        names = [f'commenter_{start + i}' for i in range(count)]
+        User.objects.bulk_create(User(username=name) for name in names)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=user, text=user.username)
+            for user in User.objects.filter(username__in=names))
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_constant_query_count(self):
+        self.add_comments(21)
+        baseline = self.count_queries()
+        self.add_comments(40)
+        self.assertEqual(self.count_queries(), baseline)
+
+    def test_comments_are_paginated_oldest_first(self):
+        self.add_comments(25)
+        response = self.client.get(self.url)
+        page = response.context['page']
+        self.assertEqual(len(page), 20)
+        self.assertEqual(
+            [comment.pk for comment in page],
+            sorted(comment.pk for comment in page))
+        response = self.client.get(self.url, {'cursor': page.next_cursor})
+        self.assertEqual(len(response.context['page']), 5)
+
+    def test_missing_post(self):
+        url = reverse('post', args=['nobody', self.post.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,152 @@
+"""Генерация миниатюр вне цикла запрос/ответ.
+
+Для карточки поста создаётся набор ширин в WebP и JPEG. Генерирует их
+пул потоков после сохранения поста; когда набор готов, его srcset
+сохраняется в кэше одним ключом. Шаблон только читает готовый набор и,
+пока его нет, показывает заглушку и ставит генерацию в очередь.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from yatube.metrics import THUMBNAIL_SECONDS
+from yatube.timing import timed
+
+from .cache import bump_feed_version
+
+logger = logging.getLogger(__name__)
+
+CARD_WIDTHS = (320, 640, 960, 1920)
+CARD_HEIGHT_RATIO = 339 / 960
+CARD_FALLBACK_WIDTH = 960
+CARD_FORMATS = {'WEBP': 'webp', 'JPEG': 'jpeg'}
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+CARD_SIZES = '(max-width: 960px) 100vw, 960px'
+PICTURE_KEY = 'posts:picture:{}'
+
+
+def card_derivatives():
+    for image_format in CARD_FORMATS:
+        for width in CARD_WIDTHS:
+            height = round(width * CARD_HEIGHT_RATIO)
+            yield (image_format, width, f'{width}x{height}',
+                   dict(CARD_OPTIONS, format=image_format))
+
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class LookupBackend(ThumbnailBackend):
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей или None; ничего не
+        генерирует и не читает исходный файл."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = LookupBackend()
+
+
+def card_picture(image):
+    """srcset карточки поста или None, если производные ещё не готовы."""
+    if not image:
+        return None
+    with timed('thumbnails'):
+        return _card_picture(image)
+
+
+def _card_picture(image):
+    key = PICTURE_KEY.format(image.name)
+    picture = cache.get(key)
+    if picture is None:
+        picture = _collect(image.name)
+        if picture is None:
+            schedule(image.name)
+            return None
+        cache.set(key, picture, None)
+    return picture
+
+
+def _collect(name):
+    picture = {'sizes': CARD_SIZES}
+    for image_format, width, geometry, options in card_derivatives():
+        thumbnail = backend.lookup(name, geometry, **options)
+        if thumbnail is None:
+            return None
+        srcset = picture.setdefault(CARD_FORMATS[image_format], [])
+        srcset.append(f'{thumbnail.url} {width}w')
+        if image_format == 'JPEG' and width == CARD_FALLBACK_WIDTH:
+            picture['src'] = thumbnail.url
+    for image_format in CARD_FORMATS.values():
+        picture[image_format] = ', '.join(picture[image_format])
+    return picture
+
+
+def schedule(name):
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if settings.THUMBNAIL_WORKERS:
+        _get_executor().submit(_generate, name)
+    else:
+        _generate(name)
+
+
+def schedule_on_commit(post):
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: schedule(name))
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _generate(name):
+    started = time.perf_counter()
+    try:
+        with timed('thumbnails'):
+            for _, _, geometry, options in card_derivatives():
+                get_thumbnail(name, geometry, **options)
+        THUMBNAIL_SECONDS.observe(time.perf_counter() - started)
+        picture = _collect(name)
+        if picture is not None:
+            cache.set(PICTURE_KEY.format(name), picture, None)
+            # Страницы с заглушкой вместо картинки устарели
+            bump_feed_version()
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        if settings.THUMBNAIL_WORKERS:
+            connection.close()
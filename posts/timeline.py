@@ -0,0 +1,145 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост авторов с небольшим числом подписчиков раскладывается по
+лентам подписчиков сразу при создании. Посты авторов, у которых
+подписчиков больше TIMELINE_FANOUT_LIMIT, не копируются, а читаются
+напрямую и подмешиваются в ленту при чтении (fan-out on read). Когда
+после отписки автор возвращается к порогу, его недавние посты
+раскладываются по лентам всех подписчиков (не больше
+TIMELINE_RESUME_MAX_ROWS строк): пока он был выше порога, они в ленты не
+копировались.
+"""
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import NEXT, CursorPaginator, keyset
+
+
+def is_pulled(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def pulled_authors(user):
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+
+
+def _followers(author_id):
+    if is_pulled(author_id):
+        return []
+    return list(Follow.objects.filter(author_id=author_id)
+                .values_list('user_id', flat=True))
+
+
+def fan_out(posts):
+    # Подписчики читаются по разу на автора: пакет постов одного автора
+    # раскладывается за два запроса и одну вставку.
+    followers = {}
+    entries = []
+    for post in posts:
+        if post.author_id not in followers:
+            followers[post.author_id] = _followers(post.author_id)
+        entries.extend(
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers[post.author_id]
+        )
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def _recent_posts(author_id, limit=None):
+    if limit is None:
+        limit = settings.TIMELINE_BACKFILL_LIMIT
+    return list(
+        Post.objects.filter(author_id=author_id).order_by('-pub_date')
+        .values_list('id', 'pub_date')[:limit]
+    )
+
+
+def _fill(user_ids, posts):
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id in user_ids for post_id, pub_date in posts),
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+def backfill(follow):
+    if is_pulled(follow.author_id):
+        return
+    _fill([follow.user_id], _recent_posts(follow.author_id))
+
+
+def trim(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id).delete()
+
+
+def resume_fan_out(author_id):
+    """После отписки: если автор только что опустился до порога, его
+    посты перестают подмешиваться при чтении и раскладываются по лентам.
+
+    Раскладка идёт в запросе отписки, поэтому строк вставляется не больше
+    TIMELINE_RESUME_MAX_ROWS: каждому подписчику — поровну последних
+    постов, но не больше TIMELINE_BACKFILL_LIMIT.
+    """
+    dropped = UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+    if not dropped:
+        return
+    followers = _followers(author_id)
+    if not followers:
+        return
+    per_follower = min(settings.TIMELINE_BACKFILL_LIMIT,
+                       settings.TIMELINE_RESUME_MAX_ROWS // len(followers))
+    if per_follower:
+        _fill(followers, _recent_posts(author_id, per_follower))
+
+
+class TimelinePaginator(CursorPaginator):
+    """Листает ленту подписок пользователя.
+
+    Ключи страницы берутся из TimelineEntry и постов «тяжёлых» авторов,
+    сливаются, а сами посты загружаются одним запросом — через feed()
+    или переданный queryset, например values() для API.
+    """
+
+    def __init__(self, user, per_page, posts=None):
+        if posts is None:
+            posts = Post.objects.feed()
+        super().__init__(posts, per_page)
+        self.user = user
+
+    @cached_property
+    def pulled_authors(self):
+        # Окно страниц читает ключи ещё дважды — авторов хватит одних.
+        return list(pulled_authors(self.user))
+
+    def fetch(self, direction, key, pk):
+        keys = self.fetch_keys(direction, key, pk, self.per_page + 1)
+        rows = self.object_list.filter(
+            pk__in=[post_id for _, post_id in keys]).order_by()
+        posts = {self.key_of(row)[1]: row for row in rows}
+        return [posts[post_id] for _, post_id in keys if post_id in posts]
+
+    def fetch_keys(self, direction, key, pk, limit):
+        keys = set(
+            keyset(TimelineEntry.objects.filter(user=self.user),
+                   direction, key, pk, 'pub_date', 'post_id')
+            .values_list('pub_date', 'post_id')[:limit]
+        )
+        authors = self.pulled_authors
+        if authors:
+            keys.update(
+                keyset(Post.objects.filter(author_id__in=authors),
+                       direction, key, pk, 'pub_date')
+                .values_list('pub_date', 'id')[:limit]
+            )
+        return sorted(keys, reverse=direction == NEXT)[:limit]
@@ -4,14 +4,20 @@ from . import views
 
 urlpatterns = [
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/feed/', views.follow_feed, name='follow_feed'),
     path('<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('<str:username>/unfollow/', views.profile_unfollow,
          name='profile_unfollow'),
     path('', views.index, name='index'),
+    path('feed/', views.index_feed, name='index_feed'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path('group/<slug:slug>/feed/', views.group_feed, name='group_feed'),
     path('new/', views.new_post, name='new_post'),
+    path('search/', views.search, name='search'),
+    path('nav/', views.nav, name='nav'),
     path('<str:username>/', views.profile, name='profile'),
+    path('<str:username>/feed/', views.profile_feed, name='profile_feed'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path(
         '<str:username>/<int:post_id>/edit/',
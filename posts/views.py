@@ -1,30 +1,126 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition
+
+from .cache import (FEED_VERSION_KEY, get_feed_modified, get_feed_version,
+                    get_versions, version_key)
+from .cards import fill_edit_slots
+from .counters import estimated_post_count
 from .forms import CommentForm, NewForm
-from .models import Follow, Group, Post, User
+from .models import Follow, Group, Post, User, UserStats
+from .paginators import CursorPaginator
+from .search import search as search_documents
+from .timeline import TimelinePaginator
+
+
+# Валидаторы для условных GET: страницы лент меняются только вместе с
+# версией ленты (её увеличивают сигналы на любые правки постов,
+# комментариев и групп), профиль и пост — ещё и с подписками автора.
+# Разметка зависит от зрителя, поэтому он тоже входит в ETag, а у
+# вошедшего — и CSRF-cookie: форма комментария на странице поста несёт
+# токен, который меняется при каждом входе.
+
+
+def _etag(request, *versions):
+    viewer = ''
+    if request.user.is_authenticated:
+        viewer = '{}:{}'.format(
+            request.user.pk,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+    raw = ':'.join(map(str, (*versions, viewer)))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _feed_etag(request, *args, **kwargs):
+    return _etag(request, get_feed_version())
+
+
+def _feed_last_modified(request, *args, **kwargs):
+    return get_feed_modified()
+
 
+def _author_etag(request, username, *args, **kwargs):
+    keys = [FEED_VERSION_KEY, version_key('follows', username)]
+    versions = get_versions(keys)
+    return _etag(request, *(versions[key] for key in keys))
 
+
+def anonymous_fast_path(view):
+    """Запрос без cookie сессии точно анонимный: сессию не читаем, чтобы
+    ответ не получил Vary: Cookie, и разрешаем кэшировать его публично.
+    Меню пользователя на такой странице догружается с /nav/."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (not settings.ANONYMOUS_FAST_PATH
+                or request.method not in ('GET', 'HEAD')
+                or settings.SESSION_COOKIE_NAME in request.COOKIES):
+            return view(request, *args, **kwargs)
+        request.user = AnonymousUser()
+        request.anonymous_fast_path = True
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            patch_cache_control(response, public=True,
+                                max_age=settings.ANONYMOUS_CACHE_MAX_AGE)
+        return response
+    return wrapper
+
+
+def _feed_fragment(request, paginator):
+    """Следующая порция ленты для бесконечной прокрутки: только карточки,
+    без base.html и контекст-процессоров, и курсор следующей порции."""
+    page = paginator.get_page(request.GET.get('cursor'))
+    html = render_to_string('includes/feed_fragment.html',
+                            {'page': page, 'user': request.user})
+    return JsonResponse({'html': html, 'next': page.next_cursor})
+
+
+@never_cache
+def nav(request):
+    return render(request, 'includes/nav_user.html')
+
+
+@anonymous_fast_path
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
 def index(request):
-    latest = Post.objects.all()
-    paginator = Paginator(latest, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    latest = Post.objects.feed()
+    paginator = CursorPaginator(latest, 10, count=estimated_post_count)
+    cursor = request.GET.get('cursor')
+    # Страница загружается только при промахе кэша фрагмента. Кэш общий
+    # для всех зрителей, а кнопки редактирования подставляются после него.
+    # Ключ фрагмента — разобранный курсор: любой мусор в ?cursor= даёт
+    # первую страницу и попадает в одну запись кэша с ней.
+    page = paginator.get_deferred_page(cursor)
     context = {
         "page": page,
         "latest": latest,
-        "paginator": paginator
+        "paginator": paginator,
+        "cursor_key": paginator.decode_cursor(cursor) if cursor else None,
+        "feed_version": get_feed_version(),
+        "feed_cache_timeout": settings.FEED_CACHE_TIMEOUT,
     }
-    return render(request, "index.html", context)
+    response = render(request, "index.html", context)
+    response.content = fill_edit_slots(response.content.decode(),
+                                       request.user)
+    return response
 
 
+@anonymous_fast_path
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = group.posts.feed()
+    paginator = CursorPaginator(posts, 10, count=group.post_count)
+    page = paginator.get_page(request.GET.get('cursor'))
     context = {
         "group": group,
         "page": page,
@@ -33,6 +129,37 @@ def group_posts(request, slug):
     return render(request, "group.html", context)
 
 
+@anonymous_fast_path
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def index_feed(request):
+    return _feed_fragment(request, CursorPaginator(Post.objects.feed(), 10))
+
+
+@anonymous_fast_path
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def group_feed(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _feed_fragment(request, CursorPaginator(group.posts.feed(), 10))
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page_number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page_number = 1
+    hits, has_next = [], False
+    if query:
+        hits, has_next = search_documents(query, page_number, 10)
+    context = {
+        'query': query,
+        'hits': hits,
+        'page_number': page_number,
+        'has_next': has_next,
+    }
+    return render(request, 'search.html', context)
+
+
 @login_required
 def new_post(request):
     form = NewForm(request.POST or None, files=request.FILES or None)
@@ -40,52 +167,64 @@ def new_post(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            # Транзакция только вокруг записи: на SQLite она начинается с
+            # INSERT и сразу берёт блокировку на запись, а не читает, а
+            # потом не может её получить при параллельных записях.
+            with transaction.atomic():
+                post.save()
             return redirect('index')
     return render(request, 'new_post.html', {'form': form})
 
 
+@anonymous_fast_path
+@condition(etag_func=_author_etag)
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    posts = user.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    author = get_object_or_404(User, username=username)
-    follow_count = Follow.objects.filter(author=author).count()
-    follow1_count = Follow.objects.filter(user=author).count()
-    following = Follow.objects.filter(user__username=request.user,
-                                      author=author).exists()
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    # У пользователей, созданных через bulk_create, строки счётчиков нет,
+    # пока её не создаст reconcile_counters: показываем нули.
+    stats = getattr(author, 'stats', None) or UserStats(user=author)
+    posts = author.posts.feed()
+    paginator = CursorPaginator(posts, 10, count=stats.posts_count)
+    page = paginator.get_page(request.GET.get('cursor'))
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author).exists()
 
     context = {
         "page": page,
-        "author": user,
+        "author": author,
         "paginator": paginator,
-        'follow_count': follow_count,
-        'follow1_count': follow1_count,
+        'follow_count': stats.followers_count,
+        'follow1_count': stats.following_count,
         'following': following
     }
     return render(request, 'profile.html', context)
 
 
+@anonymous_fast_path
+@condition(etag_func=_author_etag)
+def profile_feed(request, username):
+    author = get_object_or_404(User, username=username)
+    return _feed_fragment(request, CursorPaginator(author.posts.feed(), 10))
+
+
+@condition(etag_func=_author_etag)
 def post_view(request, username, post_id):
-    form = CommentForm(request.POST or None)
-    user = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    posts = user.posts.all()
-    comments = post.comments.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__stats'),
+        author__username=username, id=post_id)
+    comments = post.comments.select_related('author')
+    paginator = CursorPaginator(comments, 20, date_field='created',
+                                descending=False, count=post.comment_count)
+    page = paginator.get_page(request.GET.get('cursor'))
     context = {
-        "form": form,
-        "page": page,
+        "form": CommentForm(),
         "post": post,
-        "comments": comments,
         "author": post.author,
+        "comments": comments,
+        "page": page,
         "paginator": paginator,
     }
-
     return render(request, 'post.html', context)
 
 
@@ -100,7 +239,10 @@ def post_edit(request, username, post_id):
         instance=post,
     )
     if form.is_valid():
-        form.save()
+        # Смена группы двигает Group.post_count: пост и счётчики меняются
+        # вместе.
+        with transaction.atomic():
+            form.save()
         return redirect('post', username=username, post_id=post_id)
 
     context = {
@@ -134,17 +276,16 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.post = post
         comment.author = request.user
-        comment.save()
+        with transaction.atomic():
+            comment.save()
 
     return redirect('post', post.author, post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = TimelinePaginator(request.user, 10)
+    page = paginator.get_page(request.GET.get('cursor'))
     follow = True
     context = {'page': page,
                'paginator': paginator,
@@ -152,6 +293,11 @@ def follow_index(request):
     return render(request, 'follow.html', context)
 
 
+@login_required
+def follow_feed(request):
+    return _feed_fragment(request, TimelinePaginator(request.user, 10))
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
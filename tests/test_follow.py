@@ -3,9 +3,11 @@ import tempfile
 
 import pytest
 from django.contrib.auth import get_user_model
-from django.core.paginator import Page, Paginator
 from django.db.models import fields
 
+from posts.paginators import CursorPage
+from posts.timeline import TimelinePaginator
+
 try:
     from posts.models import Post
 except ImportError:
@@ -123,14 +125,14 @@ class TestFollow:
         assert 'paginator' in response.context, (
             'Проверьте, что передали переменную `paginator` в контекст страницы `/follow/`'
         )
-        assert type(response.context['paginator']) == Paginator, (
-            'Проверьте, что переменная `paginator` на странице `/follow/` типа `Paginator`'
+        assert type(response.context['paginator']) == TimelinePaginator, (
+            'Проверьте, что переменная `paginator` на странице `/follow/` типа `TimelinePaginator`'
         )
         assert 'page' in response.context, (
             'Проверьте, что передали переменную `page` в контекст страницы `/follow/`'
         )
-        assert type(response.context['page']) == Page, (
-            'Проверьте, что переменная `page` на странице `/follow/` типа `Page`'
+        assert type(response.context['page']) == CursorPage, (
+            'Проверьте, что переменная `page` на странице `/follow/` типа `CursorPage`'
         )
         assert len(response.context['page']) == 2, (
             'Проверьте, что на странице `/follow/` список статей авторов на которых подписаны'
@@ -1,5 +1,6 @@
 import pytest
-from django.core.paginator import Page, Paginator
+
+from posts.paginators import CursorPage, CursorPaginator
 
 
 class TestGroupPaginatorView:
@@ -17,14 +18,14 @@ class TestGroupPaginatorView:
         assert 'paginator' in response.context, (
             'Проверьте, что передали переменную `paginator` в контекст страницы `/group/<slug>/`'
         )
-        assert type(response.context['paginator']) == Paginator, (
-            'Проверьте, что переменная `paginator` на странице `/group/<slug>/` типа `Paginator`'
+        assert type(response.context['paginator']) == CursorPaginator, (
+            'Проверьте, что переменная `paginator` на странице `/group/<slug>/` типа `CursorPaginator`'
         )
         assert 'page' in response.context, (
             'Проверьте, что передали переменную `page` в контекст страницы `/group/<slug>/`'
         )
-        assert type(response.context['page']) == Page, (
-            'Проверьте, что переменная `page` на странице `/group/<slug>/` типа `Page`'
+        assert type(response.context['page']) == CursorPage, (
+            'Проверьте, что переменная `page` на странице `/group/<slug>/` типа `CursorPage`'
         )
 
     @pytest.mark.django_db(transaction=True)
@@ -34,12 +35,12 @@ class TestGroupPaginatorView:
         assert 'paginator' in response.context, (
             'Проверьте, что передали переменную `paginator` в контекст страницы `/`'
         )
-        assert type(response.context['paginator']) == Paginator, (
-            'Проверьте, что переменная `paginator` на странице `/` типа `Paginator`'
+        assert type(response.context['paginator']) == CursorPaginator, (
+            'Проверьте, что переменная `paginator` на странице `/` типа `CursorPaginator`'
         )
         assert 'page' in response.context, (
             'Проверьте, что передали переменную `page` в контекст страницы `/`'
         )
-        assert type(response.context['page']) == Page, (
-            'Проверьте, что переменная `page` на странице `/` типа `Page`'
+        assert type(response.context['page']) == CursorPage, (
+            'Проверьте, что переменная `page` на странице `/` типа `CursorPage`'
         )
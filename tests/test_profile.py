@@ -1,6 +1,7 @@
 import pytest
 from django.contrib.auth import get_user_model
-from django.core.paginator import Page, Paginator
+
+from posts.paginators import CursorPage
 
 
 def get_field_context(context, field_type):
@@ -25,9 +26,9 @@ class TestProfileView:
         profile_context = get_field_context(response.context, get_user_model())
         assert profile_context is not None, 'Проверьте, что передали автора в контекст страницы `/<username>/`'
 
-        page_context = get_field_context(response.context, Page)
+        page_context = get_field_context(response.context, CursorPage)
         assert page_context is not None, (
-            'Проверьте, что передали статьи автора в контекст страницы `/<username>/` типа `Page`'
+            'Проверьте, что передали статьи автора в контекст страницы `/<username>/` типа `CursorPage`'
         )
         assert len(page_context.object_list) == 1, (
             'Проверьте, что правильные статьи автора в контекст страницы `/<username>/`'
@@ -42,9 +43,9 @@ class TestProfileView:
         if new_response.status_code in (301, 302):
             new_response = client.get(f'/{new_user.username}/')
 
-        page_context = get_field_context(new_response.context, Page)
+        page_context = get_field_context(new_response.context, CursorPage)
         assert page_context is not None, (
-            'Проверьте, что передали статьи автора в контекст страницы `/<username>/` типа `Page`'
+            'Проверьте, что передали статьи автора в контекст страницы `/<username>/` типа `CursorPage`'
         )
         assert len(page_context.object_list) == 0, (
             'Проверьте, что правильные статьи автора в контекст страницы `/<username>/`'
@@ -1,10 +1,39 @@
+import re
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
+from django.urls import get_resolver
 
 User = get_user_model()
 
+SEGMENT_RE = re.compile(r'[\w.@+-]+')
+
+
+def reserved_usernames():
+    """Первые сегменты путей сайта: /search/, /feed/, /new/ и т.п.
+    Профиль пользователя с таким именем был бы недоступен."""
+    names = set()
+    patterns = list(get_resolver().url_patterns)
+    while patterns:
+        pattern = patterns.pop()
+        route = str(pattern.pattern)
+        if not route and hasattr(pattern, 'url_patterns'):
+            patterns.extend(pattern.url_patterns)
+            continue
+        segment = route.split('/')[0]
+        if SEGMENT_RE.fullmatch(segment):
+            names.add(segment)
+    return names
+
 
 class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        if username in reserved_usernames():
+            raise ValidationError("Это имя занято адресом сайта")
+        return username
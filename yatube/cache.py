@@ -0,0 +1,179 @@
+"""Двухуровневый кэш: небольшой LRU в памяти процесса перед общим кэшем.
+
+Чтение сначала идёт в локальный LRU и только при промахе — в общий
+бэкенд, алиас которого указан в OPTIONS['SHARED']. Ключи и версии
+строит общий бэкенд (его KEY_PREFIX, VERSION и KEY_FUNCTION), так что
+оба уровня и все процессы видят одинаковые ключи.
+
+Каждая запись, удаление или incr публикуется в общем кэше: счётчик эпох
+увеличивается, а под новым номером записывается изменённый ключ.
+Процессы не чаще раза в SYNC_INTERVAL секунд сверяют эпоху и выбрасывают
+из LRU чужие изменения; если журнал уже вытеснен или разрыв слишком
+велик, LRU очищается целиком. Локальная копия в любом случае живёт не
+дольше LOCAL_TIMEOUT секунд — это граница расхождения между процессами,
+даже если общий бэкенд не умеет атомарный incr (файловый кэш).
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+EPOCH_KEY = 'two_tier:epoch'
+LOG_KEY = 'two_tier:log:{}'
+CLEAR = '*'
+MAX_LOG_GAP = 1000
+
+_MISSING = object()
+_states = {}
+_states_lock = threading.Lock()
+
+
+class _LocalState:
+    """LRU процесса; общий для всех потоков, как у LocMemCache."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.epoch = None
+        self.synced = 0
+        self.own = set()
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        with _states_lock:
+            self._state = _states.setdefault(location, _LocalState())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        full_key = self.shared.make_key(key, version)
+        value = self._local_get(full_key)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        self._local_set(full_key, value, None)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._sync()
+        self.shared.set(key, value, timeout, version)
+        self._changed(self.shared.make_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._sync()
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._changed(self.shared.make_key(key, version), value, timeout)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        self._sync()
+        value = self.shared.incr(key, delta, version)
+        self._changed(self.shared.make_key(key, version), value, None)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._sync()
+        self.shared.delete(key, version)
+        full_key = self.shared.make_key(key, version)
+        self._publish(full_key)
+        with self._state.lock:
+            self._state.entries.pop(full_key, None)
+
+    def clear(self):
+        self._sync()
+        self.shared.clear()
+        self._publish(CLEAR)
+        with self._state.lock:
+            self._state.entries.clear()
+
+    def _changed(self, full_key, value, timeout):
+        self._publish(full_key)
+        self._local_set(full_key, value, timeout)
+
+    def _local_get(self, full_key):
+        state = self._state
+        with state.lock:
+            entry = state.entries.get(full_key)
+            if entry is None:
+                return _MISSING
+            pickled, expires = entry
+            if expires <= time.monotonic():
+                del state.entries[full_key]
+                return _MISSING
+            state.entries.move_to_end(full_key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, full_key, value, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.shared.default_timeout
+        lifetime = self._local_timeout
+        if timeout is not None:
+            lifetime = min(timeout, lifetime)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        state = self._state
+        with state.lock:
+            state.entries[full_key] = (pickled, time.monotonic() + lifetime)
+            state.entries.move_to_end(full_key)
+            while len(state.entries) > self._max_entries:
+                state.entries.popitem(last=False)
+
+    def _publish(self, full_key):
+        try:
+            epoch = self.shared.incr(EPOCH_KEY)
+        except ValueError:
+            self.shared.add(EPOCH_KEY, 0, None)
+            epoch = self.shared.incr(EPOCH_KEY)
+        self.shared.set(LOG_KEY.format(epoch), full_key,
+                        self._local_timeout * 2)
+        with self._state.lock:
+            self._state.own.add(epoch)
+
+    def _sync(self):
+        """Выбрасывает из LRU ключи, изменённые другими процессами."""
+        state = self._state
+        now = time.monotonic()
+        if state.epoch is not None \
+                and now - state.synced < self._sync_interval:
+            return
+        state.synced = now
+        current = self.shared.get(EPOCH_KEY) or 0
+        with state.lock:
+            seen, state.epoch = state.epoch, current
+            own, state.own = state.own, set()
+        if seen is None or current == seen:
+            return
+        if current < seen or current - seen > MAX_LOG_GAP:
+            self._drop_all()
+            return
+        epochs = [epoch for epoch in range(seen + 1, current + 1)
+                  if epoch not in own]
+        log = self.shared.get_many([LOG_KEY.format(e) for e in epochs])
+        if len(log) < len(epochs) or CLEAR in log.values():
+            self._drop_all()
+            return
+        with state.lock:
+            for full_key in log.values():
+                state.entries.pop(full_key, None)
+
+    def _drop_all(self):
+        with self._state.lock:
+            self._state.entries.clear()
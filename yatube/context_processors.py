@@ -1,5 +1,14 @@
 import datetime as dt
 
+from django.conf import settings
+
 
 def year(request):
     return {"year": dt.datetime.now().year}
+
+
+def anonymous_fast_path(request):
+    return {
+        "anonymous_fast_path": getattr(request, "anonymous_fast_path", False),
+        "csrf_cookie_name": settings.CSRF_COOKIE_NAME,
+    }
@@ -0,0 +1,287 @@
+"""Метрики в текстовом формате Prometheus на /metrics.
+
+Счётчики и гистограммы живут в памяти процесса. Если задан METRICS_DIR,
+каждый процесс не чаще раза в METRICS_FLUSH_INTERVAL секунд и при выходе
+сохраняет свои значения в METRICS_DIR/<pid>.json, а /metrics складывает
+файлы всех процессов — так метрики собираются и под pre-fork сервером.
+Каталог стоит очищать при перезапуске сервиса.
+
+Источники: MetricsMiddleware (запросы, время ответа, SQL по URL name),
+кэш-бэкенды LocMemCache/FileBasedCache/TwoTierCache из этого модуля
+(попадания и промахи, отдельно для фрагментов шаблонов), сигнал
+connection_created (открытые соединения с базой) и posts.thumbnails
+(генерация миниатюр).
+"""
+import atexit
+import glob
+import ipaddress
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache.backends import filebased, locmem
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+from yatube import cache
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FRAGMENT_PREFIX = 'template.cache.'
+
+REGISTRY = []
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def merge(self, values, labels, value):
+        values[labels] = values.get(labels, 0) + value
+
+    def samples(self, labels, value):
+        yield self.name, labels, value
+
+
+class Histogram(Counter):
+    """Значение — счётчики по корзинам BUCKETS, корзина +Inf и сумма."""
+    kind = 'histogram'
+
+    def observe(self, seconds, *labels):
+        with _lock:
+            value = self.values.setdefault(labels, [0] * (len(BUCKETS) + 2))
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    value[index] += 1
+                    break
+            else:
+                value[len(BUCKETS)] += 1
+            value[-1] += seconds
+
+    def merge(self, values, labels, value):
+        current = values.setdefault(labels, [0] * len(value))
+        values[labels] = [a + b for a, b in zip(current, value)]
+
+    def samples(self, labels, value):
+        total = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), value):
+            total += count
+            yield f'{self.name}_bucket', labels + (('le', bound),), total
+        yield f'{self.name}_sum', labels, value[-1]
+        yield f'{self.name}_count', labels, total
+
+
+REQUESTS = Counter('yatube_requests_total', 'Запросы по URL name',
+                   ('view', 'method', 'status'))
+REQUEST_SECONDS = Histogram('yatube_request_duration_seconds',
+                            'Время ответа по URL name', ('view',))
+DB_QUERIES = Counter('yatube_db_queries_total', 'SQL-запросы по URL name',
+                     ('view',))
+DB_SECONDS = Counter('yatube_db_query_seconds_total',
+                     'Суммарное время SQL по URL name', ('view',))
+DB_CONNECTIONS = Counter('yatube_db_connections_total',
+                         'Открытые соединения с базой', ('alias',))
+CACHE = Counter('yatube_cache_requests_total',
+                'Чтения кэша: hit или miss; kind=fragment для {% cache %}',
+                ('cache', 'kind', 'result'))
+THUMBNAIL_SECONDS = Histogram('yatube_thumbnail_generation_seconds',
+                              'Время генерации набора миниатюр поста')
+
+
+def snapshot():
+    with _lock:
+        return {metric.name: [[list(labels), value]
+                              for labels, value in metric.values.items()]
+                for metric in REGISTRY}
+
+
+def _path(pid):
+    return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+
+def flush():
+    if not settings.METRICS_DIR:
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = _path(os.getpid())
+    with open(f'{path}.tmp', 'w') as output:
+        json.dump(snapshot(), output)
+    os.replace(f'{path}.tmp', path)
+
+
+def _maybe_flush():
+    global _last_flush
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        _last_flush = time.monotonic()
+        flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    if settings.configured and getattr(settings, 'METRICS_DIR', None):
+        flush()
+
+
+def collect():
+    """Значения всех процессов; свой процесс — из памяти, а не из файла."""
+    snapshots = [snapshot()]
+    if settings.METRICS_DIR:
+        own = _path(os.getpid())
+        for path in glob.glob(_path('*')):
+            if path == own:
+                continue
+            try:
+                with open(path) as source:
+                    snapshots.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+    merged = {metric.name: {} for metric in REGISTRY}
+    for metric in REGISTRY:
+        for data in snapshots:
+            for labels, value in data.get(metric.name, ()):
+                metric.merge(merged[metric.name], tuple(labels), value)
+    return merged
+
+
+def _format(names, labels):
+    pairs = list(zip(names, labels[:len(names)])) + list(labels[len(names):])
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"'))
+        for name, value in pairs)
+
+
+def render():
+    lines = []
+    merged = collect()
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for labels, value in sorted(merged[metric.name].items()):
+            for name, sample_labels, sample in metric.samples(labels, value):
+                lines.append(
+                    f'{name}{_format(metric.labels, sample_labels)} {sample}')
+    return '\n'.join(lines) + '\n'
+
+
+def _allowed(request):
+    if request.user.is_staff:
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network.strip(), strict=False)
+               for network in settings.METRICS_ALLOWED_IPS if network.strip())
+
+
+def metrics_view(request):
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0, 0]
+
+        def execute(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(execute))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unresolved'
+        REQUESTS.inc(view, request.method, str(response.status_code))
+        REQUEST_SECONDS.observe(elapsed, view)
+        DB_QUERIES.inc(view, amount=queries[0])
+        DB_SECONDS.inc(view, amount=queries[1])
+        _maybe_flush()
+        return response
+
+
+def count_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS.inc(connection.alias)
+
+
+connection_created.connect(count_connection)
+
+
+def _cache_alias(location, params):
+    # Бэкенд не знает своего алиаса: ищем его в CACHES по настройкам.
+    # LOCATION в метки не попадает — у файлового кэша это путь на диске.
+    for alias, config in settings.CACHES.items():
+        rest = {key: value for key, value in config.items()
+                if key not in ('BACKEND', 'LOCATION')}
+        if config.get('LOCATION', '') == location and rest == params:
+            return alias
+    return 'unknown'
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи; имя кэша в метках — его алиас в CACHES.
+
+    get_many у этих бэкендов сводится к get, поэтому достаточно get.
+    """
+    _missing = object()
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_name = _cache_alias(location, params)
+
+    def _count(self, key, hits, misses):
+        kind = 'fragment' if key.startswith(FRAGMENT_PREFIX) else 'object'
+        if hits:
+            CACHE.inc(self.metrics_name, kind, 'hit', amount=hits)
+        if misses:
+            CACHE.inc(self.metrics_name, kind, 'miss', amount=misses)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        hit = value is not self._missing
+        self._count(key, int(hit), int(not hit))
+        return value if hit else default
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(InstrumentedCacheMixin, filebased.FileBasedCache):
+    pass
+
+
+class TwoTierCache(InstrumentedCacheMixin, cache.TwoTierCache):
+    pass
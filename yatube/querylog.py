@@ -0,0 +1,167 @@
+"""Журнал SQL-запросов с группировкой по отпечаткам.
+
+QueryLogMiddleware перехватывает выполнение запросов и сводит их по
+представлениям: для каждого отпечатка (SQL без литералов и с одинаковыми
+списками IN) копятся число выполнений, суммарное и наибольшее время.
+Запросы дольше QUERY_LOG_SLOW_MS сразу пишутся в логгер yatube.querylog.
+Раз в QUERY_LOG_DUMP_INTERVAL секунд и при выходе процесса самые
+дорогие отпечатки каждого представления сохраняются в QUERY_LOG_FILE —
+у каждого процесса свой файл, {pid} в имени заменяется на его номер.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """SQL без значений: строки и числа заменены на ?, списки — на (...)."""
+    for pattern, replacement in _NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.since = datetime.now()
+            self.requests = {}
+            # (представление, отпечаток) -> [число, сумма, максимум]
+            self.queries = {}
+
+    def record(self, view, samples):
+        prints = [(fingerprint(sql), seconds) for sql, seconds in samples]
+        with self._lock:
+            self.requests[view] = self.requests.get(view, 0) + 1
+            for key, seconds in prints:
+                entry = self.queries.setdefault((view, key), [0, 0, 0])
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+    def top(self, limit):
+        """Самые дорогие по суммарному времени отпечатки представлений."""
+        with self._lock:
+            requests = dict(self.requests)
+            queries = [(view, key, list(entry))
+                       for (view, key), entry in self.queries.items()]
+        views = {view: {'requests': count, 'queries': []}
+                 for view, count in requests.items()}
+        queries.sort(key=lambda item: item[2][1], reverse=True)
+        for view, key, (count, total, longest) in queries:
+            top = views[view]['queries']
+            if len(top) < limit:
+                top.append({
+                    'fingerprint': key,
+                    'count': count,
+                    'per_request': round(count / requests[view], 2),
+                    'total_ms': round(total * 1000, 2),
+                    'mean_ms': round(total * 1000 / count, 2),
+                    'max_ms': round(longest * 1000, 2),
+                })
+        return views
+
+
+stats = QueryStats()
+_last_dump = time.monotonic()
+_dump_lock = threading.Lock()
+
+
+def dump(path=None):
+    """Пишет сводку в файл; по умолчанию — в QUERY_LOG_FILE."""
+    path = (path or settings.QUERY_LOG_FILE).format(pid=os.getpid())
+    report = {
+        'pid': os.getpid(),
+        'since': stats.since.isoformat(),
+        'dumped': datetime.now().isoformat(),
+        'views': stats.top(settings.QUERY_LOG_TOP),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True,
+                  ensure_ascii=False)
+    os.replace(temporary, path)
+    return path
+
+
+def _maybe_dump():
+    global _last_dump
+    if not settings.QUERY_LOG_FILE:
+        return
+    if time.monotonic() - _last_dump < settings.QUERY_LOG_DUMP_INTERVAL:
+        return
+    if not _dump_lock.acquire(blocking=False):
+        return
+    try:
+        _last_dump = time.monotonic()
+        dump()
+    except OSError:
+        logger.exception('Не удалось сохранить журнал запросов')
+    finally:
+        _dump_lock.release()
+
+
+@atexit.register
+def _dump_at_exit():
+    if settings.configured and getattr(settings, 'QUERY_LOG_FILE', None) \
+            and stats.requests:
+        dump()
+
+
+class QueryLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_LOG_ENABLED:
+            return self.get_response(request)
+
+        samples = []
+
+        def execute(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                samples.append((sql, time.perf_counter() - started))
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(execute))
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unresolved'
+        stats.record(view, samples)
+        threshold = settings.QUERY_LOG_SLOW_MS / 1000
+        for sql, seconds in samples:
+            if seconds >= threshold:
+                logger.warning('Медленный запрос в %s, %.1f мс: %s', view,
+                               seconds * 1000, fingerprint(sql))
+        _maybe_dump()
+        return response
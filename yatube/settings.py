@@ -11,8 +11,6 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 import os
 
-from django.core.mail import send_mail
-
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -50,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.timing.TimingMiddleware',
+    'yatube.querylog.QueryLogMiddleware',
+    'yatube.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,7 +64,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.timing.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,6 +74,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'yatube.context_processors.year',
+                'yatube.context_processors.anonymous_fast_path',
             ],
         },
     },
@@ -146,16 +148,85 @@ LOGOUT_REDIRECT_URL = "index"
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
-send_mail(
-    'Тема письма',
-    'Текст письма.',
-    'from@example.com',  # Это поле "От кого"
-    ['to@example.com'],  # Это поле "Кому" (можно указать список адресов)
-    fail_silently=False,  # Сообщать об ошибках («молчать ли об ошибках?»)
-)
-
+# default — двухуровневый кэш (yatube.cache): LRU процесса перед общим
+# кэшем shared. Чтобы воркеры делили кэш, задайте CACHE_DIR или замените
+# shared на Redis/Memcached; без этого shared живёт в памяти процесса.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'yatube.metrics.TwoTierCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 30,
+            'SYNC_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': 'yatube.metrics.FileBasedCache',
+        'LOCATION': os.environ['CACHE_DIR'],
+    } if os.environ.get('CACHE_DIR') else {
+        'BACKEND': 'yatube.metrics.LocMemCache',
+        'LOCATION': 'shared',
+    },
 }
+
+# Время жизни кэша ленты; устаревшие страницы сбрасываются сигналами posts
+FEED_CACHE_TIMEOUT = 60 * 5
+# Время жизни отрисованной карточки поста; устаревание — через версии
+# поста, автора и группы в ключе (posts.cards)
+CARD_CACHE_TIMEOUT = 60 * 60
+# Время жизни оценки числа постов (posts.counters.estimated_post_count):
+# после него оценка заново складывается из счётчиков авторов
+POST_COUNT_TIMEOUT = 60 * 10
+
+# Быстрый путь для анонимов: запросы без cookie сессии к лентам и профилям
+# обслуживаются без обращения к сессии и с публичным Cache-Control, чтобы
+# их мог кэшировать обратный прокси
+ANONYMOUS_FAST_PATH = True
+ANONYMOUS_CACHE_MAX_AGE = 60
+
+# Посты авторов, у которых подписчиков больше этого числа, не копируются
+# в ленты подписчиков, а подмешиваются при чтении /follow/
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL_LIMIT = 1000
+# Сколько строк ленты можно вставить, когда после отписки автор
+# опускается до TIMELINE_FANOUT_LIMIT и его посты снова раскладываются
+TIMELINE_RESUME_MAX_ROWS = 10000
+
+# Потоков для фоновой генерации миниатюр; 0 — генерировать сразу
+THUMBNAIL_WORKERS = 2
+
+# Бэкенд полнотекстового поиска: SqliteFtsBackend, PostgresBackend
+# или SimpleBackend для остальных СУБД
+SEARCH_BACKEND = 'posts.search.SqliteFtsBackend'
+
+# Доля запросов, для которых TimingMiddleware замеряет SQL, шаблоны и
+# миниатюры и отдаёт их в Server-Timing и логгер yatube.timing
+TIMING_SAMPLE_RATE = 1.0 if DEBUG else 0.01
+
+# Журнал SQL по отпечаткам (yatube.querylog): запросы дольше
+# QUERY_LOG_SLOW_MS пишутся в лог, сводка по представлениям сохраняется
+# в QUERY_LOG_FILE раз в QUERY_LOG_DUMP_INTERVAL секунд
+QUERY_LOG_ENABLED = DEBUG
+QUERY_LOG_SLOW_MS = 100
+QUERY_LOG_FILE = os.path.join(BASE_DIR, 'querylog', 'queries-{pid}.json')
+QUERY_LOG_DUMP_INTERVAL = 60
+QUERY_LOG_TOP = 20
+
+# Каталог, где процессы складывают метрики для /metrics; без него
+# /metrics показывает только процесс, который обработал запрос
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+# Адреса и сети, с которых /metrics доступен без входа (сотрудникам —
+# всегда); через переменную окружения — через запятую
+METRICS_ALLOWED_IPS = os.environ.get(
+    'METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Размер страницы JSON API по умолчанию и наибольший, который можно
+# запросить параметром limit
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Сколько постов или комментариев принимает один пакетный запрос
+API_BULK_MAX_ITEMS = 500
@@ -0,0 +1,126 @@
+"""Замер времени запроса по составляющим: SQL, шаблоны, миниатюры.
+
+TimingMiddleware для доли запросов TIMING_SAMPLE_RATE включает сбор
+замеров, отдаёт их в заголовке Server-Timing и пишет одну JSON-строку
+в логгер yatube.timing. Для остальных запросов вся цена — один вызов
+random() и пустые проверки в timed().
+
+Время шаблонов считает бэкенд DjangoTemplates из этого модуля: он
+замеряет рендер шаблона верхнего уровня вместе с include и ленивыми
+запросами, которые шаблон выполняет. Миниатюры отмечают себя через
+timed('thumbnails').
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('timings', default=None)
+
+
+class Timings:
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self._running = set()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    def ms(self, name):
+        return round(self.durations.get(name, 0) * 1000, 2)
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('sql', time.perf_counter() - started)
+
+
+@contextmanager
+def timed(name):
+    """Добавляет время блока к замеру текущего запроса, если он идёт.
+
+    Вложенные блоки с тем же именем не считаются повторно.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._running:
+        yield
+        return
+    timings._running.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._running.discard(name)
+        timings.add(name, time.perf_counter() - started)
+
+
+class TimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = Timings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timings.add('total', time.perf_counter() - started)
+
+        response['Server-Timing'] = ', '.join((
+            f'sql;dur={timings.ms("sql")};desc="{timings.queries} queries"',
+            f'tpl;dur={timings.ms("templates")}',
+            f'thumb;dur={timings.ms("thumbnails")}',
+            f'total;dur={timings.ms("total")}',
+        ))
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.url_name if match else None,
+            'status': response.status_code,
+            'queries': timings.queries,
+            'sql_ms': timings.ms('sql'),
+            'template_ms': timings.ms('templates'),
+            'thumbnail_ms': timings.ms('thumbnails'),
+            'total_ms': timings.ms('total'),
+        }, ensure_ascii=False))
+        return response
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timed('templates'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -4,6 +4,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from yatube.metrics import metrics_view
+
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
@@ -11,6 +13,8 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
+    path("metrics", metrics_view, name="metrics"),
+    path("api/v1/", include("posts.api_urls")),
     path("", include("posts.urls")),
     path("about/", include("about.urls", namespace="about")),
 ]